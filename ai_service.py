@@ -1,13 +1,74 @@
 import openai
 import os
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import redis
 from dotenv import load_dotenv
-from typing import List, Optional
+from collections import Counter
+from typing import List, Optional, Tuple
 import logging
+from jobs import get_redis
 
 load_dotenv()
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OpenAI calls run on one event loop thread shared by all callers (see run_async),
+# with at most OPENAI_MAX_CONCURRENCY requests in flight across the process.
+# Each attempt times out after OPENAI_TIMEOUT_SECONDS, and a call gives up after
+# OPENAI_DEADLINE_SECONDS in total, including waiting for a slot and retries.
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 4))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 20))
+OPENAI_DEADLINE_SECONDS = float(os.getenv("OPENAI_DEADLINE_SECONDS", 60))
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", 4))
+OPENAI_BACKOFF_BASE_SECONDS = 1
+OPENAI_BACKOFF_MAX_SECONDS = 20
+
+# Errors worth retrying: timeouts, connection failures, rate limits and 5xx responses
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError,
+    openai.RateLimitError, openai.InternalServerError
+)
+
+# Initialize OpenAI client (retries are handled by request_completion)
+client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=OPENAI_TIMEOUT_SECONDS, max_retries=0)
+
+SUMMARY_MODEL = "gpt-3.5-turbo"
+SUMMARY_MAX_TOKENS = 150
+SUMMARY_SYSTEM_PROMPT = "You are creating professional profile descriptions for recruiters based on candidate reviews. Write in third person about the recruiter, not about the reviews themselves. Always incorporate specific details from the reviews. Never embellish or make up qualities not evidenced in the reviews. When information is limited, create a brief 1-2 sentence summary focusing on the specific feedback provided."
+
+# Summary engine: "openai", or "extractive" for the local summarizer (no network calls)
+SUMMARY_ENGINE = os.getenv("SUMMARY_ENGINE", "openai").lower()
+
+# Used when the OpenAI call fails: "extractive" summary, or "generic" for FALLBACK_SUMMARY
+SUMMARY_FALLBACK = os.getenv("SUMMARY_FALLBACK", "extractive").lower()
+
+# Number of review sentences quoted by the extractive summarizer
+EXTRACTIVE_SENTENCES = int(os.getenv("EXTRACTIVE_SENTENCES", 3))
+
+# The extractive summarizer reads only the most recent reviews, keeping it fast however many there are
+EXTRACTIVE_MAX_REVIEWS = int(os.getenv("EXTRACTIVE_MAX_REVIEWS", 500))
+
+# Returned when the API call fails and SUMMARY_FALLBACK=generic
+FALLBACK_SUMMARY = "Based on the available reviews, this recruiter has received feedback from candidates."
+
+# Above this many reviews, summaries are built map-reduce style: each chunk of
+# SUMMARY_CHUNK_SIZE reviews is condensed into notes, then the notes are combined,
+# so no single prompt grows with the number of reviews
+SUMMARY_MAP_REDUCE_THRESHOLD = int(os.getenv("SUMMARY_MAP_REDUCE_THRESHOLD", 40))
+SUMMARY_CHUNK_SIZE = int(os.getenv("SUMMARY_CHUNK_SIZE", 20))
+
+# Summaries are cached in Redis by a hash of everything sent to the API, so
+# regenerating a summary whose review texts haven't changed costs no API call.
+# The cache keeps at most SUMMARY_CACHE_MAX_ENTRIES summaries, evicting the oldest.
+SUMMARY_CACHE_PREFIX = "recruiterbook-summaries:"
+SUMMARY_CACHE_INDEX = f"{SUMMARY_CACHE_PREFIX}index"
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 50000))
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", 30 * 86400))
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,12 +81,338 @@ def sanitize_review_text(text: str) -> str:
     # Limit length to avoid token limits
     return text[:1000]  # Adjust this limit based on your needs
 
-def generate_summary(reviews: List) -> str:
-    """Generates an AI-powered summary for recruiter reviews."""
+def summary_cache_key(prompt: str, temperature: float) -> str:
+    """Hashes the full API request, so any change to the reviews, prompt or model misses the cache."""
+    request = json.dumps(
+        [SUMMARY_MODEL, SUMMARY_MAX_TOKENS, temperature, SUMMARY_SYSTEM_PROMPT, prompt]
+    )
+    return SUMMARY_CACHE_PREFIX + hashlib.sha256(request.encode()).hexdigest()
+
+def get_cached_summary(key: str) -> Optional[str]:
+    try:
+        summary = get_redis().get(key)
+    except redis.RedisError as e:
+        logger.error(f"Summary cache unavailable: {str(e)}")
+        return None
+    return summary.decode() if summary is not None else None
+
+def cache_summary(key: str, summary: str):
+    try:
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.set(key, summary, ex=SUMMARY_CACHE_TTL)
+        pipe.zadd(SUMMARY_CACHE_INDEX, {key: time.time()})
+        pipe.zcard(SUMMARY_CACHE_INDEX)
+        size = pipe.execute()[-1]
+        if size > SUMMARY_CACHE_MAX_ENTRIES:
+            oldest = client.zrange(SUMMARY_CACHE_INDEX, 0, size - SUMMARY_CACHE_MAX_ENTRIES - 1)
+            pipe = client.pipeline()
+            pipe.delete(*oldest)
+            pipe.zrem(SUMMARY_CACHE_INDEX, *oldest)
+            pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Could not cache summary: {str(e)}")
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling OpenAI while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Stops calling OpenAI for `cooldown` seconds once at least `threshold` of the
+    last `window` attempts failed (after at least `min_calls` attempts), so callers
+    fail fast to the fallback summary during an outage instead of waiting out
+    timeouts. After the cooldown a single trial call decides whether to close it again.
+    """
+
+    def __init__(self, window: int = 20, min_calls: int = 5, threshold: float = 0.5, cooldown: float = 60):
+        self.window = window
+        self.min_calls = min_calls
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._results = []
+        self._opened_at = None
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._trial_running = True
+            return True
+
+    def record(self, success: bool):
+        with self._lock:
+            if self._opened_at is not None:
+                # Result of the trial call
+                self._trial_running = False
+                if success:
+                    self._opened_at = None
+                    self._results = []
+                    logger.info("OpenAI circuit breaker closed")
+                else:
+                    self._opened_at = time.monotonic()
+                return
+
+            self._results = (self._results + [success])[-self.window:]
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures / len(self._results) >= self.threshold:
+                self._opened_at = time.monotonic()
+                logger.error(f"OpenAI circuit breaker opened after {failures} failures in {len(self._results)} calls")
+
+circuit_breaker = CircuitBreaker()
+
+_loop = None
+_loop_lock = threading.Lock()
+_semaphore = None
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Returns the event loop OpenAI calls run on, starting its thread on first use."""
+    global _loop, _semaphore
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+            threading.Thread(target=_loop.run_forever, name="openai", daemon=True).start()
+    return _loop
+
+def run_async(coro):
+    """Runs a coroutine on the OpenAI event loop and waits for its result from a sync caller."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+async def create_completion(prompt: str, temperature: float) -> str:
+    response = await client.chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=SUMMARY_MAX_TOKENS,
+        temperature=temperature
+    )
+    return response.choices[0].message.content.strip()
+
+async def request_completion(prompt: str, temperature: float) -> str:
+    """
+    Calls OpenAI within OPENAI_DEADLINE_SECONDS, retrying transient errors with
+    exponential backoff and full jitter. Raises CircuitOpenError without calling
+    the API while the circuit breaker is open.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + OPENAI_DEADLINE_SECONDS
+    attempt = 0
+    while True:
+        attempt += 1
+        # Waiting for a slot counts against the deadline, but not as an OpenAI failure
+        try:
+            await asyncio.wait_for(_semaphore.acquire(), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            raise TimeoutError("No OpenAI request slot became free before the deadline")
+        try:
+            if not circuit_breaker.allow():
+                raise CircuitOpenError("OpenAI circuit breaker is open")
+            try:
+                timeout = min(OPENAI_TIMEOUT_SECONDS, deadline - loop.time())
+                summary = await asyncio.wait_for(create_completion(prompt, temperature), max(timeout, 0))
+            except RETRYABLE_ERRORS as e:
+                circuit_breaker.record(False)
+                error = e
+            except Exception:
+                circuit_breaker.record(False)
+                raise
+            else:
+                circuit_breaker.record(True)
+                return summary
+        finally:
+            _semaphore.release()
+
+        delay = random.uniform(0, min(OPENAI_BACKOFF_MAX_SECONDS, OPENAI_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+        if attempt >= OPENAI_MAX_ATTEMPTS or loop.time() + delay >= deadline:
+            raise error
+        logger.info(f"OpenAI call failed ({type(error).__name__}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+def complete_summary(prompt: str, temperature: float) -> str:
+    """Returns the model's summary for a prompt, from the summary cache when possible."""
+    return complete_summaries([prompt], temperature)[0]
+
+def complete_summaries(prompts: List[str], temperature: float) -> List[str]:
+    """
+    Returns the model's summary for each prompt, using the summary cache where possible
+    and requesting the rest concurrently (within OPENAI_MAX_CONCURRENCY).
+    Raises the first error if any request fails.
+    """
+    keys = [summary_cache_key(prompt, temperature) for prompt in prompts]
+    summaries = [get_cached_summary(key) for key in keys]
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+    if missing:
+        async def request_missing():
+            return await asyncio.gather(*[request_completion(prompts[i], temperature) for i in missing])
+        for i, summary in zip(missing, run_async(request_missing())):
+            summaries[i] = summary
+            cache_summary(keys[i], summary)
+    return summaries
+
+def feedback_list(reviews: List) -> str:
+    """Formats review texts as a bulleted list, skipping empty ones."""
+    lines = []
+    for review in reviews:
+        sanitized_text = sanitize_review_text(review.text)
+        if sanitized_text.strip():
+            lines.append(f"- {sanitized_text}")
+    return "\n".join(lines)
+
+def chunked(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def summarize_chunks(reviews: List) -> List[str]:
+    """Map step: condenses each chunk of reviews into short notes about the recruiter, concurrently."""
+    prompts = [
+        "Summarize what the following candidate feedback says about this recruiter in 2-3 factual sentences. "
+        "Keep specific details, and note where candidates disagree:\n\n"
+        + feedback_list(chunk)
+        for chunk in chunked(reviews, SUMMARY_CHUNK_SIZE)
+    ]
+    return complete_summaries(prompts, 0.2)
+
+def combine_summaries(notes: List[str]) -> str:
+    """Reduce step: combines notes on parts of a recruiter's feedback into one profile."""
+    # Combine in groups first if there are too many notes for one prompt
+    while len(notes) > SUMMARY_CHUNK_SIZE:
+        notes = [combine_summaries(group) for group in chunked(notes, SUMMARY_CHUNK_SIZE)]
+    prompt = (
+        "Each of the following notes summarizes a different group of candidate reviews of the same recruiter. "
+        "Combine them into one professional description of this recruiter, focusing on their style, approach, and qualities:\n\n"
+        + "\n".join(f"- {note}" for note in notes)
+        + "\nCreate a concise profile that balances being informative with staying true to the feedback provided."
+    )
+    return complete_summary(prompt, 0.7)
+
+def map_reduce_summary(reviews: List) -> str:
+    """Summarizes a large set of reviews in chunks, then combines the chunk notes."""
+    return combine_summaries(summarize_chunks(reviews))
+
+def update_summary(previous_summary: str, reviews: List) -> Optional[str]:
+    """
+    Revises an existing summary with new or edited reviews only, instead of
+    re-reading all of the recruiter's reviews. Returns None if the API call fails.
+    """
+    try:
+        if len(reviews) > SUMMARY_MAP_REDUCE_THRESHOLD:
+            feedback = "\n".join(f"- {note}" for note in summarize_chunks(reviews))
+        else:
+            feedback = feedback_list(reviews)
+        if not feedback:
+            return previous_summary
+
+        prompt = (
+            "Here is the current description of this recruiter, based on earlier candidate feedback:\n\n"
+            f"{previous_summary}\n\n"
+            "Here is new or updated candidate feedback. Where it updates an earlier review, it replaces what that review said:\n\n"
+            f"{feedback}\n\n"
+            "Revise the description to reflect the new feedback as well. Keep it concise and do not drop details "
+            "from the current description unless the new feedback contradicts them."
+        )
+        summary = complete_summary(prompt, 0.7)
+        return summary if summary and len(summary) >= 10 else None
+    except Exception as e:
+        logger.error(f"Incremental summary update failed: {str(e)}")
+        return None
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD = re.compile(r"[a-z][a-z']+")
+STOPWORDS = frozenset("""
+    a about after all also am an and any are as at be been but by can could did do does for from had has have
+    he her him his how i if in into is it its just me more most my no not of on or our out over she so some
+    than that the their them then there they this to too up us very was we were what when which who will with
+    would you your recruiter recruiters
+""".split())
+
+def extractive_summary(reviews: List) -> str:
+    """
+    Summarizes reviews locally by quoting their most representative sentences:
+    each sentence is a TF-IDF vector, sentences are ranked by cosine similarity to
+    the centroid of all sentences, and near-duplicates of a chosen sentence are skipped.
+    Deterministic and makes no network calls. Only the last EXTRACTIVE_MAX_REVIEWS
+    reviews are read (reviews are expected in id order).
+    """
+    sentences = []
+    for review in reviews[-EXTRACTIVE_MAX_REVIEWS:]:
+        for sentence in SENTENCE_SPLIT.split(sanitize_review_text(review.text or "")):
+            sentence = sentence.strip()
+            terms = [word for word in WORD.findall(sentence.lower()) if word not in STOPWORDS]
+            if len(terms) >= 2:
+                sentences.append((sentence, Counter(terms)))
+    if not sentences:
+        return "This recruiter has limited feedback from candidates. More reviews are needed for a comprehensive profile."
+
+    document_frequency = Counter()
+    for _, terms in sentences:
+        document_frequency.update(terms.keys())
+    idf = {term: math.log(len(sentences) / count) + 1 for term, count in document_frequency.items()}
+
+    vectors = []
+    centroid = {}
+    for sentence, terms in sentences:
+        vector = {term: count * idf[term] for term, count in terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        for term in vector:
+            vector[term] /= norm
+            centroid[term] = centroid.get(term, 0) + vector[term]
+        vectors.append(vector)
+
+    def similarity(vector, other):
+        if len(vector) > len(other):
+            vector, other = other, vector
+        return sum(weight * other.get(term, 0) for term, weight in vector.items())
+
+    # Sort by similarity to the centroid, then by position so ties are broken deterministically
+    scores = [sum(weight * centroid[term] for term, weight in vector.items()) for vector in vectors]
+    ranked = sorted(range(len(sentences)), key=lambda i: (-scores[i], i))
+    chosen = []
+    for i in ranked:
+        if all(similarity(vectors[i], vectors[j]) < 0.7 for j in chosen):
+            chosen.append(i)
+            if len(chosen) == EXTRACTIVE_SENTENCES:
+                break
+
+    quotes = " ".join(f'"{sentences[i][0]}"' for i in sorted(chosen))
+    count = len(reviews)
+    return f"From {count} candidate review{'s' if count != 1 else ''}: {quotes}"
+
+def fallback_summary(reviews: List) -> str:
+    if SUMMARY_FALLBACK == "extractive":
+        return extractive_summary(reviews)
+    return FALLBACK_SUMMARY
+
+def summarize_reviews(reviews: List) -> Tuple[str, bool]:
+    """
+    Summarizes reviews with the configured SUMMARY_ENGINE, falling back per
+    SUMMARY_FALLBACK if the OpenAI call fails. Returns the summary and whether it
+    was written by the model, since only those can be revised by update_summary.
+    """
     if not reviews:
-        return "No reviews available for this recruiter yet."
+        return "No reviews available for this recruiter yet.", False
+    if SUMMARY_ENGINE == "extractive":
+        return extractive_summary(reviews), False
+
+    summary = generate_ai_summary(reviews)
+    if summary is None:
+        return fallback_summary(reviews), False
+    return summary, True
+
+def generate_summary(reviews: List) -> str:
+    """Generates a summary for recruiter reviews."""
+    return summarize_reviews(reviews)[0]
 
+def generate_ai_summary(reviews: List) -> Optional[str]:
+    """Generates an AI-powered summary for recruiter reviews. Returns None if the API call fails."""
     try:
+        if len(reviews) > SUMMARY_MAP_REDUCE_THRESHOLD:
+            return map_reduce_summary(reviews)
+
         # Count total words and analyze review content
         total_words = sum(len(review.text.split()) for review in reviews)
         extremely_limited = total_words <= 2  # Extremely limited info (e.g., "Good" or single-word responses)
@@ -52,22 +439,12 @@ def generate_summary(reviews: List) -> str:
             prompt += "\nCreate a concise profile that balances being informative with staying true to the feedback provided."
             temperature = 0.7
             
-        # Make the API call with error handling
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are creating professional profile descriptions for recruiters based on candidate reviews. Write in third person about the recruiter, not about the reviews themselves. Always incorporate specific details from the reviews. Never embellish or make up qualities not evidenced in the reviews. When information is limited, create a brief 1-2 sentence summary focusing on the specific feedback provided."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=150,
-            temperature=temperature
-        )
-
-        summary = response.choices[0].message.content.strip()
+        # Make the API call (or reuse the cached result) with error handling
+        summary = complete_summary(prompt, temperature)
         
         # Basic validation
         if not summary or len(summary) < 10:
-            return "Based on the available reviews, this recruiter has received feedback from candidates."
+            return None
         
         # For limited information, enforce reasonable brevity but don't default to generic message
         if limited_info and len(summary) > 120:
@@ -87,9 +464,9 @@ def generate_summary(reviews: List) -> str:
 
     except openai.APIError as e:
         logger.error(f"OpenAI API error: {str(e)}")
-        return "Based on the available reviews, this recruiter has received feedback from candidates."
+        return None
     except Exception as e:
         logger.error(f"Unexpected error in summary generation: {str(e)}")
-        return "Based on the available reviews, this recruiter has received feedback from candidates." 
+        return None 
 
 
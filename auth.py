@@ -14,6 +14,7 @@ from database import SessionLocal
 from crud import get_or_create_user
 from models import User, ReviewVote
 from schemas import ReviewVoteResponse, UserCreate, UserResponse
+from vote_buffer import VOTE_BATCHING_ENABLED, vote_buffer
 
 load_dotenv()
 
@@ -186,6 +187,9 @@ def get_user_votes(
     Retrieve all vote records for the currently authenticated user.
     """
     user_id = current_user.get("id")
+    # Write out this user's buffered votes first so the list reflects their latest clicks
+    if VOTE_BATCHING_ENABLED:
+        vote_buffer.flush(user_id=user_id)
     votes = db.query(ReviewVote).filter(ReviewVote.user_id == user_id).all()
     return votes
 
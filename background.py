@@ -0,0 +1,123 @@
+"""
+Shared bounded executor for background work (recruiter verification, AI summaries,
+industry inference).
+
+A fixed number of worker threads keeps background database connections well inside
+the pool configured in database.py. At most BACKGROUND_QUEUE_LIMIT tasks wait for a
+worker. When the queue is full, fire-and-forget submissions from request handlers
+are rejected instead of piling up, while batch jobs can block until there is room.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", 4))
+BACKGROUND_QUEUE_LIMIT = int(os.getenv("BACKGROUND_QUEUE_LIMIT", 1000))
+
+# How long shutdown waits for queued and running tasks to finish
+BACKGROUND_DRAIN_SECONDS = int(os.getenv("BACKGROUND_DRAIN_SECONDS", 20))
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a limit on the number of tasks waiting for a worker, and
+    counters for queued, running, completed, failed and rejected tasks.
+    """
+
+    def __init__(self, max_workers: int = BACKGROUND_WORKERS, max_queue: int = BACKGROUND_QUEUE_LIMIT):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="background")
+        # One slot per running or queued task
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Condition()
+        self._closed = False
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def submit(self, fn, *args, name: str = None, block: bool = False, timeout: float = None, **kwargs):
+        """
+        Schedules fn(*args, **kwargs) and returns its Future. Returns None if the task
+        was rejected because the queue is full (after waiting up to `timeout` seconds
+        when block=True) or because the executor is shutting down. Failures are
+        logged and counted rather than raised.
+        """
+        name = name or getattr(fn, "__name__", "task")
+        if self._closed or not self._slots.acquire(blocking=block, timeout=timeout if block else None):
+            with self._lock:
+                self._rejected += 1
+            print(f"Background task {name} rejected: queue full or shutting down")
+            return None
+
+        with self._lock:
+            self._queued += 1
+        try:
+            return self._executor.submit(self._run, name, fn, args, kwargs)
+        except RuntimeError:
+            # The executor was shut down after the check above
+            with self._lock:
+                self._queued -= 1
+                self._rejected += 1
+                self._lock.notify_all()
+            self._slots.release()
+            return None
+
+    def _run(self, name, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        failed = False
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            failed = True
+            print(f"Background task {name} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._running -= 1
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._lock.notify_all()
+            self._slots.release()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Waits until no task is queued or running. Returns False on timeout."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            while self._queued or self._running:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float = BACKGROUND_DRAIN_SECONDS):
+        """
+        Stops accepting tasks and waits up to `timeout` seconds for queued and running
+        ones to finish. Tasks still queued after that are cancelled.
+        """
+        self._closed = True
+        if not self.wait_idle(timeout):
+            print(f"Background executor drain timed out with {self._queued} queued and {self._running} running tasks")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_limit": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+
+background_executor = BoundedExecutor()
@@ -1,71 +1,499 @@
 """
 Cache module for the application. Provides Redis caching functionality.
+
+Cache keys are structured and derived from the route's parameters, e.g.
+"recruiterbook-cache:reviews:recruiter:{recruiter_id}", so a write knows exactly
+which keys it affects and deletes them. Endpoints whose parameters are open-ended
+(such as search) belong to a family instead: the family's version is part of their
+keys, and one INCR of the version invalidates every entry of the family.
+
+Each worker process keeps a small LRU cache (L1) in front of Redis, so hot
+responses are served without a Redis round trip. Invalidations are published
+over Redis pub/sub so every worker evicts its L1 entries too.
+
+Responses have a soft and a hard TTL. Past the soft TTL a response is still
+served while one background refresh recomputes it, and a Redis lock makes sure
+only one worker recomputes a given key, so an expiring entry does not send every
+concurrent request to the database at once.
 """
+import asyncio
+import json
 import os
-from fastapi_cache import FastAPICache
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from math import ceil
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi_cache.backends import Backend
 from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.coder import JsonCoder
+import redis
 from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, AsyncSessionLocal
+from jobs import get_redis
 
 # Default TTL (Time To Live) for cache entries in seconds
 DEFAULT_CACHE_TTL = 3600  # 1 hour
 
+# Prefix for all cache keys to avoid collisions
+CACHE_PREFIX = "recruiterbook-cache:"
+
+# Prefix for the family version counters
+FAMILY_VERSION_PREFIX = f"{CACHE_PREFIX}family:"
+
+# Number of keys deleted per round trip when clearing the whole cache
+CLEAR_BATCH_SIZE = 500
+
+# Prefix for the locks held by the worker recomputing a key
+LOCK_PREFIX = f"{CACHE_PREFIX}lock:"
+
+# How long a recompute may hold its lock, and how long requests missing the
+# cache wait for another worker's recompute before running the query themselves
+LOCK_TIMEOUT_SECONDS = 30
+LOCK_WAIT_SECONDS = 5
+LOCK_POLL_SECONDS = 0.05
+
+# Channel on which invalidations are broadcast to every worker's L1 cache
+INVALIDATION_CHANNEL = f"{CACHE_PREFIX}invalidations"
+
+# Per-process L1 cache bounds. The TTL also bounds staleness if an
+# invalidation message is missed while a worker is reconnecting.
+L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", 1000))
+L1_TTL_SECONDS = int(os.getenv("CACHE_L1_TTL_SECONDS", 30))
+
 # Redis client for direct operations
 redis_client = None
 
+# Identifies this process's invalidation messages, which it has already applied
+PROCESS_ID = None
+
+def _new_process_id():
+    global PROCESS_ID
+    PROCESS_ID = uuid.uuid4().hex
+
+_new_process_id()
+# Workers forked after this module was imported each need their own id
+os.register_at_fork(after_in_child=_new_process_id)
+
+# Two-tier backend used by @cached, and the task listening for invalidations
+cache_backend = None
+_listener_task = None
+
+# Recomputes of missing entries running in this process, so concurrent requests
+# for a key share one, and keys whose stale entry is being refreshed
+_inflight = {}
+_refreshing = set()
+
+class TwoTierBackend(Backend):
+    """
+    Cache backend that serves entries from a per-process LRU with a TTL when it can,
+    and falls back to Redis otherwise. Entries read from Redis are kept locally for
+    at most L1_TTL_SECONDS (or their remaining Redis TTL, if shorter).
+    """
+
+    def __init__(self, redis_backend: RedisBackend, max_entries: int = L1_MAX_ENTRIES, ttl: int = L1_TTL_SECONDS):
+        self.redis_backend = redis_backend
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # Bumped on every eviction, so a Redis read that raced with an
+        # invalidation is not stored locally
+        self._generation = 0
+        self.stats = {
+            "l1": {"hits": 0, "misses": 0},
+            "redis": {"hits": 0, "misses": 0},
+        }
+
+    def local_size(self):
+        """Number of entries currently held in the L1 cache."""
+        return len(self._entries)
+
+    def _get_local(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return ceil(expires_at - now), value
+
+    def _set_local(self, key, value, expire):
+        ttl = min(self.ttl, expire) if expire else self.ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def evict_local(self, keys=None):
+        """Drops the given keys (or everything) from this process's L1 cache."""
+        self._generation += 1
+        if keys is None:
+            self._entries.clear()
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def get_with_ttl(self, key):
+        local = self._get_local(key)
+        if local is not None:
+            self.stats["l1"]["hits"] += 1
+            return local
+        self.stats["l1"]["misses"] += 1
+
+        generation = self._generation
+        ttl, value = await self.redis_backend.get_with_ttl(key)
+        if value is None:
+            self.stats["redis"]["misses"] += 1
+            return ttl, value
+        self.stats["redis"]["hits"] += 1
+        if generation == self._generation:
+            self._set_local(key, value, ttl if ttl and ttl > 0 else None)
+        return ttl, value
+
+    async def get(self, key):
+        ttl, value = await self.get_with_ttl(key)
+        return value
+
+    async def set(self, key, value, expire=None):
+        await self.redis_backend.set(key, value, expire)
+        self._set_local(key, value, expire)
+
+    async def clear(self, namespace=None, key=None):
+        self.evict_local([key] if key else None)
+        return await self.redis_backend.clear(namespace, key)
+
 async def setup_cache():
     """
     Initialize the Redis cache.
     This should be called during application startup.
     """
-    global redis_client
-    
+    global redis_client, cache_backend, _listener_task
+
     # Get Redis connection string from environment variable or use default for local development
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-    
-    # Create Redis connection
-    redis = aioredis.from_url(redis_url, encoding="utf8", decode_responses=True)
+
+    # Create Redis connection. Responses are left as bytes because cached
+    # values are decoded by the JSON coder.
+    redis = aioredis.from_url(redis_url)
     redis_client = redis
-    
-    # Initialize FastAPI cache with Redis backend
-    FastAPICache.init(
-        RedisBackend(redis),
-        prefix="recruiterbook-cache:",  # Prefix for all cache keys to avoid collisions
-        expire=DEFAULT_CACHE_TTL,  # Default expiration time
-    )
-
-async def invalidate_cache_keys(patterns):
-    """
-    Invalidate cache entries matching the given patterns.
-    This should be called after write operations to ensure cache consistency.
-    
+
+    # Serve cached responses from the local LRU in front of Redis
+    cache_backend = TwoTierBackend(RedisBackend(redis))
+
+    _listener_task = asyncio.get_running_loop().create_task(listen_for_invalidations())
+
+async def shutdown_cache():
+    """
+    Stop listening for invalidations.
+    This should be called during application shutdown.
+    """
+    global _listener_task
+    if _listener_task:
+        _listener_task.cancel()
+        _listener_task = None
+
+def evict_local(message):
+    """Applies an invalidation message to this process's L1 cache."""
+    if cache_backend is None:
+        return
+    if message.get("all"):
+        cache_backend.evict_local()
+    else:
+        cache_backend.evict_local([f"{CACHE_PREFIX}{key}" for key in message.get("keys", [])])
+
+async def publish_invalidation(message, local=True):
+    """
+    Evicts locally right away (unless local is False), then tells the other
+    workers to do the same.
+    """
+    if local:
+        evict_local(message)
+    await redis_client.publish(INVALIDATION_CHANNEL, json.dumps({**message, "origin": PROCESS_ID}))
+
+async def listen_for_invalidations():
+    """
+    Evicts L1 entries invalidated by other workers. If the subscription drops,
+    the whole L1 is cleared since messages may have been missed meanwhile.
+    """
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            try:
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    message = json.loads(message["data"])
+                    if message.get("origin") != PROCESS_ID:
+                        evict_local(message)
+            finally:
+                await pubsub.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Cache invalidation listener failed: {str(e)}")
+            if cache_backend is not None:
+                cache_backend.evict_local()
+            await asyncio.sleep(1)
+
+def get_cache_stats():
+    """Returns hit and miss counters for the L1 and Redis tiers of this process."""
+    if cache_backend is None:
+        return {}
+    return {
+        "l1": {**cache_backend.stats["l1"], "entries": cache_backend.local_size()},
+        "redis": dict(cache_backend.stats["redis"]),
+    }
+
+async def get_family_versions(families):
+    """
+    Returns the current version of each family (0 for families never invalidated),
+    fetched with a single MGET, or None if Redis can't be reached.
+    """
+    if not redis_client or not families:
+        return [0] * len(families)
+    try:
+        versions = await redis_client.mget([f"{FAMILY_VERSION_PREFIX}{family}" for family in families])
+    except Exception as e:
+        print(f"Error reading cache family versions: {str(e)}")
+        return None
+    return [int(version or 0) for version in versions]
+
+async def build_cache_key(key, families, kwargs):
+    """
+    Returns the full cache key for `key`, a template formatted with the endpoint's
+    path and query parameters, e.g. "reviews:recruiter:{recruiter_id}". If families
+    are given, their current versions are appended so the entries can be
+    invalidated as a group. Returns None if the versions can't be read, since
+    a key without the current versions could serve invalidated entries.
+    """
+    # Only the request parameters identify a response, not the per-request DB session
+    params = {
+        name: "" if value is None else value
+        for name, value in kwargs.items()
+        if not isinstance(value, (Session, AsyncSession))
+    }
+    cache_key = f"{CACHE_PREFIX}{key.format(**params)}"
+    if families:
+        versions = await get_family_versions(families)
+        if versions is None:
+            return None
+        cache_key += f":v{'.'.join(str(version) for version in versions)}"
+    return cache_key
+
+def lock_key(cache_key):
+    return f"{LOCK_PREFIX}{cache_key[len(CACHE_PREFIX):]}"
+
+async def acquire_lock(cache_key):
+    """Takes the recompute lock for a key. Returns its token, or None if another worker holds it."""
+    token = uuid.uuid4().hex
+    try:
+        acquired = await redis_client.set(lock_key(cache_key), token, nx=True, ex=LOCK_TIMEOUT_SECONDS)
+    except Exception as e:
+        # Without Redis there is nothing to coordinate with, so go ahead unlocked
+        print(f"Error acquiring cache lock for {cache_key}: {str(e)}")
+        return token
+    return token if acquired else None
+
+async def release_lock(cache_key, token):
+    """Releases the recompute lock for a key, unless it expired and was taken by someone else."""
+    try:
+        await redis_client.eval(
+            "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end return 0",
+            1, lock_key(cache_key), token
+        )
+    except Exception as e:
+        # The lock expires on its own after LOCK_TIMEOUT_SECONDS
+        print(f"Error releasing cache lock for {cache_key}: {str(e)}")
+
+async def read_entry(cache_key):
+    """Returns the cached {"value", "fresh_until"} entry for a key, or None."""
+    try:
+        _, cached_value = await cache_backend.get_with_ttl(cache_key)
+    except Exception as e:
+        print(f"Error reading cache key {cache_key}: {str(e)}")
+        return None
+    return JsonCoder.decode(cached_value) if cached_value is not None else None
+
+async def call_endpoint(func, kwargs, own_session=False):
+    """
+    Runs an endpoint function. With own_session, the request's DB session is
+    replaced by a new one, for recomputes that outlive the request.
+    """
+    if not own_session:
+        if asyncio.iscoroutinefunction(func):
+            return await func(**kwargs)
+        return await run_in_threadpool(func, **kwargs)
+
+    if asyncio.iscoroutinefunction(func):
+        async with AsyncSessionLocal() as db:
+            return await func(**{name: db if isinstance(value, AsyncSession) else value for name, value in kwargs.items()})
+
+    with SessionLocal() as db:
+        return await run_in_threadpool(func, **{name: db if isinstance(value, Session) else value for name, value in kwargs.items()})
+
+async def recompute(cache_key, func, kwargs, soft_ttl, hard_ttl, own_session=False):
+    """Runs the endpoint and stores its response, returning the new cache entry."""
+    result = await call_endpoint(func, kwargs, own_session=own_session)
+    entry = {"value": result, "fresh_until": time.time() + soft_ttl}
+    encoded = JsonCoder.encode(entry)
+    try:
+        await cache_backend.set(cache_key, encoded, hard_ttl)
+        # Drop copies of the previous entry from other workers' L1 caches. This
+        # process's L1 already holds the new entry, so it is left alone.
+        await publish_invalidation({"keys": [cache_key[len(CACHE_PREFIX):]]}, local=False)
+    except Exception as e:
+        print(f"Error writing cache key {cache_key}: {str(e)}")
+    return JsonCoder.decode(encoded)
+
+async def refresh_in_background(cache_key, func, kwargs, soft_ttl, hard_ttl):
+    """Recomputes a stale entry, if no other worker is already doing so."""
+    try:
+        token = await acquire_lock(cache_key)
+        if token is None:
+            return
+        try:
+            await recompute(cache_key, func, kwargs, soft_ttl, hard_ttl, own_session=True)
+        finally:
+            await release_lock(cache_key, token)
+    except Exception as e:
+        print(f"Background refresh of {cache_key} failed: {str(e)}")
+    finally:
+        _refreshing.discard(cache_key)
+
+async def fill_missing(cache_key, func, kwargs, soft_ttl, hard_ttl):
+    """
+    Computes a missing entry. If another worker holds the key's lock, waits for
+    its result for up to LOCK_WAIT_SECONDS before running the endpoint itself.
+    """
+    token = await acquire_lock(cache_key)
+    if token is None:
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+            entry = await read_entry(cache_key)
+            if entry is not None:
+                return entry
+        return await recompute(cache_key, func, kwargs, soft_ttl, hard_ttl, own_session=True)
+
+    try:
+        return await recompute(cache_key, func, kwargs, soft_ttl, hard_ttl, own_session=True)
+    finally:
+        await release_lock(cache_key, token)
+
+def cached(key, *families, soft_ttl=DEFAULT_CACHE_TTL, hard_ttl=None):
+    """
+    Caches an endpoint's response under a structured key (see build_cache_key).
+
+    A response younger than soft_ttl is served as is. Between soft_ttl and hard_ttl
+    (twice soft_ttl by default) it is still served, while a single background
+    refresh recomputes it. Requests that find no entry at all share one recompute
+    per process, and one per cluster through a Redis lock.
+    """
+    hard_ttl = hard_ttl or soft_ttl * 2
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(**kwargs):
+            if cache_backend is None:
+                return await call_endpoint(func, kwargs)
+
+            cache_key = await build_cache_key(key, families, kwargs)
+            if cache_key is None:
+                # Redis is unavailable, so serve the response uncached
+                return await call_endpoint(func, kwargs)
+            entry = await read_entry(cache_key)
+            if entry is not None:
+                if entry["fresh_until"] <= time.time() and cache_key not in _refreshing:
+                    _refreshing.add(cache_key)
+                    asyncio.create_task(refresh_in_background(cache_key, func, kwargs, soft_ttl, hard_ttl))
+                return entry["value"]
+
+            task = _inflight.get(cache_key)
+            if task is None:
+                task = asyncio.create_task(fill_missing(cache_key, func, kwargs, soft_ttl, hard_ttl))
+                task.add_done_callback(lambda _: _inflight.pop(cache_key, None))
+                _inflight[cache_key] = task
+            entry = await asyncio.shield(task)
+            return entry["value"]
+
+        return wrapper
+
+    return decorator
+
+async def invalidate_cache(keys=(), families=()):
+    """
+    Invalidate cached responses after a write operation.
+
     Args:
-        patterns (list): List of pattern strings to match cache keys.
+        keys (list): Structured keys to delete, e.g. ["reviews:recruiter:123"].
+        families (list): Families whose entries are all invalidated, e.g. ["recruiters:search"].
     """
-    if not redis_client:
+    if not redis_client or not (keys or families):
         return
-    
-    for pattern in patterns:
-        # Add the FastAPI Cache prefix to the pattern
-        prefixed_pattern = f"recruiterbook-cache:{pattern}"
-        
-        # Find all keys matching the pattern
-        keys = await redis_client.keys(prefixed_pattern)
-        
+
+    async with redis_client.pipeline(transaction=False) as pipe:
         if keys:
-            # Delete all matched keys
-            await redis_client.delete(*keys)
+            pipe.delete(*{f"{CACHE_PREFIX}{key}" for key in keys})
+        # Bumping a family's version makes every key built from the old version unreachable
+        for family in set(families):
+            pipe.incr(f"{FAMILY_VERSION_PREFIX}{family}")
+        await pipe.execute()
+
+    # Family entries need no local eviction, their keys change with the version
+    if keys:
+        await publish_invalidation({"keys": sorted(set(keys))})
+
+def invalidate_cache_sync(keys=(), families=()):
+    """
+    invalidate_cache for code running outside the event loop, such as background
+    jobs in the worker process, using the synchronous Redis client.
+    """
+    if not (keys or families):
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        if keys:
+            pipe.delete(*{f"{CACHE_PREFIX}{key}" for key in keys})
+        for family in set(families):
+            pipe.incr(f"{FAMILY_VERSION_PREFIX}{family}")
+        if keys:
+            # Every web worker, including this process if it serves requests, evicts from its L1
+            pipe.publish(INVALIDATION_CHANNEL, json.dumps({"keys": sorted(set(keys))}))
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Cache invalidation failed: {str(e)}")
 
 async def invalidate_all_cache():
     """
     Invalidate all cache entries.
     This should be called for operations that affect multiple resources.
+    Keys are found with SCAN, which walks the keyspace incrementally instead of
+    blocking Redis like KEYS.
     """
     if not redis_client:
         return
-        
-    # Find all keys with the FastAPI Cache prefix
-    keys = await redis_client.keys("recruiterbook-cache:*")
-    
-    if keys:
-        # Delete all matched keys
-        await redis_client.delete(*keys) 
\ No newline at end of file
+
+    family_prefix = FAMILY_VERSION_PREFIX.encode()
+    batch = []
+    async for key in redis_client.scan_iter(match=f"{CACHE_PREFIX}*", count=CLEAR_BATCH_SIZE):
+        # Keep the family counters, so old versions never become reachable again
+        if not key.startswith(family_prefix):
+            batch.append(key)
+        if len(batch) >= CLEAR_BATCH_SIZE:
+            await redis_client.unlink(*batch)
+            batch = []
+    if batch:
+        await redis_client.unlink(*batch)
+
+    await publish_invalidation({"all": True})
@@ -1,14 +1,84 @@
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import User, Recruiter, Company, Review, ReviewVote, IndustryEnum
-from schemas import UserCreate, RecruiterCreate, ReviewCreate, ReviewUpdate, IndustryEnum as SchemaIndustryEnum
-from ai_service import generate_summary
+from schemas import UserCreate, RecruiterCreate, ReviewCreate, ReviewUpdate, RecruiterResponse, ReviewResponse, IndustryEnum as SchemaIndustryEnum
+from ai_service import summarize_reviews, update_summary, SUMMARY_ENGINE
 from google import verify_recruiter, infer_company_industry
 import uuid
 from better_profanity import profanity
 from fuzzywuzzy import fuzz, process
 from database import SessionLocal
-from sqlalchemy import func
+from sqlalchemy import func, or_, case, literal, update, text, select
+from sqlalchemy.exc import IntegrityError
+from search_index import get_recruiter_index, index_recruiter
+from cache import invalidate_cache_sync
+from jobs import enqueue_job, job_handler, schedule_coalesced, supersede, start_coalesced, is_current
+from concurrent.futures import Future, wait
+from datetime import datetime
+import os
+import json
+import base64
+
+# Recruiter search engine: "index" (in-process trigram index) or "pg_trgm" (pushed down to Postgres)
+RECRUITER_SEARCH_ENGINE = os.getenv("RECRUITER_SEARCH_ENGINE", "index").lower()
+
+# Number of pg_trgm candidates fetched from Postgres for rescoring
+PG_TRGM_CANDIDATES = 200
+
+# Page sizes for the paginated list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Summary regeneration waits this long after a review changes, so a burst of
+# changes to one recruiter's reviews is summarized once
+SUMMARY_DEBOUNCE_SECONDS = float(os.getenv("SUMMARY_DEBOUNCE_SECONDS", 30))
+
+# Summaries of recruiters with at least this many reviews are updated with just the
+# reviews added or edited since the last summary (see regenerate_summary)
+SUMMARY_INCREMENTAL = os.getenv("SUMMARY_INCREMENTAL", "true").lower() == "true"
+SUMMARY_INCREMENTAL_MIN_REVIEWS = int(os.getenv("SUMMARY_INCREMENTAL_MIN_REVIEWS", 10))
+
+# Rows fetched per round trip (and lines per chunk written) by the NDJSON exports
+EXPORT_BATCH_SIZE = 1000
+
+def encode_cursor(last_id):
+    """Encodes the id of the last row of a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(last_id).encode()).decode()
+
+def decode_cursor(cursor: str, id_type: type):
+    """Decodes a cursor produced by encode_cursor, rejecting malformed ones."""
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(last_id, id_type) or isinstance(last_id, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
+def keyset_page(query, id_column, limit: int, cursor: str = None):
+    """
+    Restricts a Query or select() to one page in `id_column` order (keyset pagination),
+    starting after the row encoded in `cursor`. One extra row is fetched to tell
+    whether there is a next page. Returns the query and the effective page size.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        query = query.filter(id_column > decode_cursor(cursor, id_column.type.python_type))
+    return query.order_by(id_column).limit(limit + 1), limit
+
+def build_page(rows, id_column, limit: int):
+    """Returns the page for rows fetched by keyset_page, with the cursor of the next page (None on the last page)."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], id_column.key))
+    return {"items": rows, "next_cursor": next_cursor}
+
+def paginate(query, id_column, limit: int, cursor: str = None):
+    """Returns one page of `query` in `id_column` order, starting after `cursor`."""
+    query, limit = keyset_page(query, id_column, limit, cursor)
+    return build_page(query.all(), id_column, limit)
 
 # User creation/login
 def get_or_create_user(db: Session, user_data: UserCreate):
@@ -57,6 +127,16 @@ def contains_profanity(text):
     profanity.load_censor_words()
     return profanity.contains_profanity(text)
 
+# Industries a company can be classified as; NULL means not classified yet
+VALID_INDUSTRIES = {industry.value for industry in IndustryEnum}
+
+def industry_job_key(company_id: str) -> str:
+    return f"industry:{company_id}"
+
+def schedule_industry_inference(company_id: str):
+    """Classifies a company in the background, once however many requests ask for it meanwhile."""
+    schedule_coalesced("infer_industry", industry_job_key(company_id), 0, company_id=company_id)
+
 # Company creation (ensures no duplicates)
 def get_or_create_company(db: Session, company_name: str):
     # Check for profanity in company name
@@ -65,24 +145,26 @@ def get_or_create_company(db: Session, company_name: str):
         
     company = db.query(Company).filter(Company.name == company_name).first()
     if not company:
-        # Create a new company and infer its industry
-        industry_str = infer_company_industry(company_name)
-        
-        # Convert string industry to enum integer
-        industry_int = IndustryEnum.from_str(industry_str)
-        
-        company = Company(id=str(uuid.uuid4()), name=company_name, industry=industry_int)
+        # Create the company unclassified; its industry is inferred in the background
+        # so the search doesn't add to request latency
+        company = Company(id=str(uuid.uuid4()), name=company_name, industry=None)
         db.add(company)
         db.commit()
         db.refresh(company)
-    elif not company.industry or not isinstance(company.industry, int) or company.industry not in [0, 1, 2, 3]:
-        # If company exists but doesn't have a valid industry, infer and set it
-        industry_str = infer_company_industry(company_name)
-        company.industry = IndustryEnum.from_str(industry_str)
-        db.commit()
-        db.refresh(company)
+        schedule_industry_inference(company.id)
+    elif company.industry not in VALID_INDUSTRIES:
+        # Unclassified (or an invalid legacy value); Tech (0) is a valid industry
+        schedule_industry_inference(company.id)
     return company
 
+def recruiters_query(db: Session):
+    """
+    Base query for every recruiter-returning read.
+    Loads each recruiter's company in the same SELECT, since RecruiterResponse
+    serializes it and a lazy load would cost one query per recruiter.
+    """
+    return db.query(Recruiter).options(joinedload(Recruiter.company))
+
 # Recruiter creation (ensures no duplicates)
 def get_or_create_recruiter(db: Session, recruiter_data: RecruiterCreate):
     # Check for profanity in recruiter name
@@ -118,39 +200,88 @@ def get_or_create_recruiter(db: Session, recruiter_data: RecruiterCreate):
         db.add(recruiter)
         db.commit()
         db.refresh(recruiter)
+        # Make the new recruiter searchable without waiting for an index rebuild
+        index_recruiter(recruiter.id, recruiter.fullName, recruiter_data.company)
     
-    # Schedule verification in a background task (don't wait for it)
-    import threading
-    def verify_in_background():
-        try:
-            verified = verify_recruiter(recruiter_data.fullName, recruiter_data.company)
-            # Update the recruiter's verified status in a new session
-            with SessionLocal() as bg_db:
-                db_recruiter = bg_db.query(Recruiter).filter(Recruiter.id == recruiter.id).first()
-                if db_recruiter:
-                    db_recruiter.verified = verified
-                    bg_db.commit()
-        except Exception as e:
-            print(f"Background verification failed: {str(e)}")
-    
-    # Start the background task
-    thread = threading.Thread(target=verify_in_background)
-    thread.daemon = True  # Thread will die when main thread exits
-    thread.start()
+    # Schedule verification in a background job (don't wait for it)
+    enqueue_job("verify_recruiter", recruiter_id=recruiter.id)
     
     return recruiter
 
+@job_handler("verify_recruiter")
+def verify_recruiter_status(recruiter_id: str):
+    """Job: checks whether a recruiter is a real recruiter at their company and stores the result."""
+    with SessionLocal() as bg_db:
+        recruiter = recruiters_query(bg_db).filter(Recruiter.id == recruiter_id).first()
+        if not recruiter:
+            return
+        company_name = recruiter.company.name if recruiter.company else ""
+        full_name = recruiter.fullName
+    
+    # Search outside the session so no DB connection is held during the HTTP calls
+    verified = verify_recruiter(full_name, company_name)
+    with SessionLocal() as bg_db:
+        bg_db.query(Recruiter).filter(Recruiter.id == recruiter_id).update(
+            {"verified": verified}, synchronize_session=False
+        )
+        bg_db.commit()
+
+
+def _find_candidates_in_index(db: Session, fullName: str, company: str = None):
+    """Candidates from the in-process trigram index."""
+    candidate_ids = get_recruiter_index(db).candidates(fullName, company)
+    if not candidate_ids:
+        return []
+    return recruiters_query(db).filter(Recruiter.id.in_(candidate_ids)).all()
+
+def _find_candidates_pg_trgm(db: Session, fullName: str, company: str = None):
+    """
+    Candidates filtered and ranked inside Postgres with pg_trgm, using the GIN index
+    created by scripts/create_recruiter_trgm_index.py.
+    Only the top PG_TRGM_CANDIDATES rows come back; company matches rank first.
+    Ranking also uses word similarity in both directions, so a name contained in a
+    longer query ("john allen" for "john allen hernandez") ranks as high as partial_ratio
+    will score it, instead of losing its place to names merely similar to the whole query.
+    """
+    query_text = fullName.lower()
+    name = func.lower(Recruiter.fullName)
+    similarity = func.greatest(
+        func.similarity(name, query_text),
+        func.word_similarity(query_text, name),
+        func.word_similarity(name, query_text),
+    )
+
+    # The company is already joined for ranking, so populate it from the same row
+    query = db.query(Recruiter).outerjoin(Recruiter.company).options(contains_eager(Recruiter.company)).filter(
+        or_(name.op("%")(query_text), literal(query_text).op("<%")(name))
+    )
+    if company:
+        company_match = case((func.lower(Company.name) == company.lower(), 1), else_=0)
+        query = query.order_by(company_match.desc())
+    return query.order_by(similarity.desc()).limit(PG_TRGM_CANDIDATES).all()
+
+SEARCH_ENGINES = {
+    "index": _find_candidates_in_index,
+    "pg_trgm": _find_candidates_pg_trgm,
+}
+
+# Fail at startup on a misspelled engine rather than silently searching with another one
+if RECRUITER_SEARCH_ENGINE not in SEARCH_ENGINES:
+    raise ValueError(
+        f"Unknown RECRUITER_SEARCH_ENGINE: {RECRUITER_SEARCH_ENGINE} (expected one of {', '.join(SEARCH_ENGINES)})"
+    )
 
 # Find recruiters by full name and optional company
 def find_recruiters(db: Session, fullName: str, company: str = None):
-    # Get all recruiters
-    query = db.query(Recruiter)
-    all_recruiters = query.all()
+    # Narrow the search to recruiters whose names are close to the query
+    find_candidates = SEARCH_ENGINES[RECRUITER_SEARCH_ENGINE]
+    candidates = find_candidates(db, fullName, company)
     
-    # If no recruiters at all in DB, return empty list
-    if not all_recruiters:
+    # If no recruiter names are even close, return empty list
+    if not candidates:
         return []
     
+    # Rescore the candidates in Python so both engines rank identically
     # Set an absolute minimum similarity threshold to prevent irrelevant matches
     ABSOLUTE_MIN_THRESHOLD = 65
     
@@ -158,7 +289,7 @@ def find_recruiters(db: Session, fullName: str, company: str = None):
     scored_recruiters = []
     
     # Calculate similarity scores for each recruiter's name
-    for recruiter in all_recruiters:
+    for recruiter in candidates:
         # Calculate different similarity scores
         token_sort_score = fuzz.token_sort_ratio(fullName.lower(), recruiter.fullName.lower())
         partial_score = fuzz.partial_ratio(fullName.lower(), recruiter.fullName.lower())
@@ -196,7 +327,168 @@ def find_recruiters(db: Session, fullName: str, company: str = None):
     return sorted_recruiters[:10]
 
 def get_recruiter_by_id(db: Session, recruiter_id: str):
-    return db.query(Recruiter).filter(Recruiter.id == recruiter_id).first()
+    return recruiters_query(db).filter(Recruiter.id == recruiter_id).first()
+
+# Review rating fields and the recruiter columns aggregated from them
+RATING_AGGREGATES = {
+    "responsiveness": ("sum_resp", "avg_resp"),
+    "professionalism": ("sum_prof", "avg_prof"),
+    "helpfulness": ("sum_help", "avg_help"),
+    "final_stage": ("sum_final_stage", "avg_final_stage"),
+}
+
+def review_ratings(review):
+    """Returns the rating fields of a review as a dict, treating missing ratings as 0."""
+    return {field: getattr(review, field) or 0 for field in RATING_AGGREGATES}
+
+def adjust_rating_aggregates(db: Session, recruiter_id: str, count_delta: int, rating_deltas: dict):
+    """
+    Applies a review insert, edit or delete to a recruiter's running rating totals
+    with a single UPDATE, and derives the integer averages from the new totals.
+    Runs inside the caller's transaction.
+    Returns the recruiter's new review count, or None if the recruiter doesn't exist.
+    """
+    new_count = Recruiter.review_count + count_delta
+    values = {"review_count": new_count}
+    for field, (sum_column, avg_column) in RATING_AGGREGATES.items():
+        new_sum = getattr(Recruiter, sum_column) + rating_deltas.get(field, 0)
+        values[sum_column] = new_sum
+        values[avg_column] = case((new_count > 0, new_sum // new_count), else_=0)
+
+    result = db.execute(
+        update(Recruiter)
+        .where(Recruiter.id == recruiter_id)
+        .values(values)
+        .returning(Recruiter.review_count)
+    )
+    return result.scalar()
+
+def reconcile_rating_aggregates(db: Session, recruiter_id: str = None):
+    """
+    Rebuilds the running rating totals and averages from the reviews table,
+    for one recruiter or (by default) for all of them.
+    """
+    reset = update(Recruiter).values(
+        review_count=0, sum_resp=0, sum_prof=0, sum_help=0, sum_final_stage=0,
+        avg_resp=0, avg_prof=0, avg_help=0, avg_final_stage=0
+    )
+    totals = db.query(
+        Review.recruiter_id,
+        func.count(Review.id).label("review_count"),
+        *[func.coalesce(func.sum(getattr(Review, field)), 0).label(sum_column)
+          for field, (sum_column, _) in RATING_AGGREGATES.items()]
+    ).group_by(Review.recruiter_id)
+    if recruiter_id:
+        reset = reset.where(Recruiter.id == recruiter_id)
+        totals = totals.filter(Review.recruiter_id == recruiter_id)
+    totals = totals.subquery()
+
+    values = {"review_count": totals.c.review_count}
+    for sum_column, avg_column in RATING_AGGREGATES.values():
+        values[sum_column] = totals.c[sum_column]
+        values[avg_column] = totals.c[sum_column] // totals.c.review_count
+
+    db.execute(reset.execution_options(synchronize_session=False))
+    result = db.execute(
+        update(Recruiter)
+        .where(Recruiter.id == totals.c.recruiter_id)
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+def summary_job_key(recruiter_id: str) -> str:
+    return f"summary:{recruiter_id}"
+
+def schedule_summary(recruiter_id: str):
+    """Regenerates a recruiter's summary after SUMMARY_DEBOUNCE_SECONDS, once per burst of review changes."""
+    schedule_coalesced(
+        "regenerate_summary", summary_job_key(recruiter_id), SUMMARY_DEBOUNCE_SECONDS, recruiter_id=recruiter_id
+    )
+
+def review_watermark(review: Review):
+    """When the review's text last changed, which is all its summary depends on."""
+    return review.text_updated_at or review.created_at
+
+def summary_columns(summary_text: str, reviews, revisable: bool):
+    """
+    Returns the recruiter column values for a summary built from `reviews` (in id order).
+    Summaries that weren't written by the model (extractive or fallback) get no
+    watermark, so they are rebuilt from all reviews next time.
+    """
+    return {
+        "summary": summary_text,
+        "summary_watermark": max(filter(None, map(review_watermark, reviews)), default=None) if revisable else None,
+        "summary_max_review_id": reviews[-1].id,
+        "summary_review_count": len(reviews),
+    }
+
+def reviews_since_summary(recruiter: Recruiter, reviews):
+    """
+    Returns the reviews added or edited since the recruiter's summary was written,
+    or None if the summary must be rebuilt from all reviews: incremental updates are
+    disabled, the extractive engine is in use (revising a summary always calls OpenAI),
+    the summary has no watermark or covers few reviews, or a review it covers was
+    deleted (which can't be taken back out of a summary).
+    """
+    if not SUMMARY_INCREMENTAL or SUMMARY_ENGINE == "extractive":
+        return None
+    if recruiter.summary_watermark is None or not recruiter.summary:
+        return None
+    if (recruiter.summary_review_count or 0) < SUMMARY_INCREMENTAL_MIN_REVIEWS:
+        return None
+    covered = [review for review in reviews if review.id <= recruiter.summary_max_review_id]
+    if len(covered) < recruiter.summary_review_count:
+        return None
+    return [
+        review for review in reviews
+        if review.id > recruiter.summary_max_review_id
+        or (review_watermark(review) and review_watermark(review) > recruiter.summary_watermark)
+    ]
+
+@job_handler("regenerate_summary")
+def regenerate_summary(recruiter_id: str):
+    """
+    Job: regenerates a recruiter's AI summary from their current reviews.
+    Established summaries are revised with only the reviews added or edited since
+    they were written; otherwise all reviews are summarized.
+    The result is discarded if the reviews changed again while it was being generated;
+    the newer change has scheduled its own run.
+    """
+    key = summary_job_key(recruiter_id)
+    generation = start_coalesced(key)
+    # Get fresh data in a new session
+    with SessionLocal() as bg_db:
+        bg_recruiter = bg_db.query(Recruiter).filter(Recruiter.id == recruiter_id).first()
+        # A stable order keeps the prompt, and so its summary cache key, the same for the same reviews
+        bg_reviews = bg_db.query(Review).filter(Review.recruiter_id == recruiter_id).order_by(Review.id).all()
+        if not bg_recruiter or not bg_reviews:
+            return
+
+        summary_text = None
+        # Whether the summary can be revised incrementally next time
+        revisable = True
+        changed_reviews = reviews_since_summary(bg_recruiter, bg_reviews)
+        if changed_reviews == []:
+            return
+        if changed_reviews:
+            summary_text = update_summary(bg_recruiter.summary, changed_reviews)
+        if summary_text is None:
+            summary_text, revisable = summarize_reviews(bg_reviews)
+
+        if not is_current(key, generation):
+            print(f"Discarding superseded summary for recruiter {recruiter_id}")
+            return
+        for column, value in summary_columns(summary_text, bg_reviews, revisable).items():
+            setattr(bg_recruiter, column, value)
+        bg_db.commit()
+
+    # Responses embedding the recruiter's summary
+    invalidate_cache_sync(
+        keys=["recruiters:featured", f"recruiter:{recruiter_id}"],
+        families=["recruiters:all", "recruiters:search"]
+    )
 
 # Post a review
 def post_review(db: Session, review_data: ReviewCreate):
@@ -217,56 +509,76 @@ def post_review(db: Session, review_data: ReviewCreate):
     new_review = Review(**review_dict)
     
     db.add(new_review)
-    db.commit()
-    db.refresh(new_review)
 
-    # Update recruiter's average ratings
-    recruiter = db.query(Recruiter).filter(Recruiter.id == review_data.recruiter_id).first()
-    if not recruiter:
+    # Fold the new ratings into the recruiter's running totals in the same transaction
+    review_count = adjust_rating_aggregates(db, review_data.recruiter_id, 1, review_ratings(new_review))
+    if review_count is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Recruiter not found")
 
-    reviews = db.query(Review).filter(Review.recruiter_id == review_data.recruiter_id).all()
-
-    recruiter.avg_resp = sum(r.responsiveness for r in reviews) // len(reviews)
-    recruiter.avg_prof = sum(r.professionalism for r in reviews) // len(reviews)
-    recruiter.avg_help = sum(r.helpfulness for r in reviews) // len(reviews)
-    recruiter.avg_final_stage = sum(r.final_stage for r in reviews) // len(reviews)
-    
-    # Update database with average ratings now
     db.commit()
+    db.refresh(new_review)
     
     # Generate summary in the background
-    import threading
-    def generate_summary_in_background():
-        try:
-            # Get fresh data in a new session
-            with SessionLocal() as bg_db:
-                bg_reviews = bg_db.query(Review).filter(Review.recruiter_id == review_data.recruiter_id).all()
-                if bg_reviews:
-                    summary_text = generate_summary(bg_reviews)
-                    bg_recruiter = bg_db.query(Recruiter).filter(Recruiter.id == review_data.recruiter_id).first()
-                    if bg_recruiter:
-                        bg_recruiter.summary = summary_text
-                        bg_db.commit()
-        except Exception as e:
-            print(f"Background summary generation failed: {str(e)}")
-    
-    # Start the background task
-    thread = threading.Thread(target=generate_summary_in_background)
-    thread.daemon = True
-    thread.start()
+    schedule_summary(review_data.recruiter_id)
 
     return new_review
 
 
+def get_review_cache_scopes(db: Session, review_ids=None, recruiter_ids=None):
+    """
+    Returns (recruiter_id, company name, company industry) for the recruiters behind
+    the given reviews and/or the given recruiters, so callers can work out which
+    cached responses a write affects.
+    """
+    query = db.query(Recruiter.id, Company.name, Company.industry).outerjoin(
+        Company, Recruiter.company_id == Company.id
+    )
+    conditions = []
+    if review_ids:
+        conditions.append(Recruiter.id.in_(
+            db.query(Review.recruiter_id).filter(Review.id.in_(review_ids))
+        ))
+    if recruiter_ids:
+        conditions.append(Recruiter.id.in_(recruiter_ids))
+    if not conditions:
+        return []
+    return query.filter(or_(*conditions)).all()
+
 def get_reviews(db: Session, recruiter_id: str):
     return db.query(Review).filter(Review.recruiter_id == recruiter_id).all()
 
-def get_all_reviews(db: Session):
-    return db.query(Review).all()
+def get_all_reviews(db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    return paginate(db.query(Review), Review.id, limit, cursor)
+
+def stream_ndjson(build_query, response_model):
+    """
+    Yields the rows of build_query(db) as NDJSON, one line per row, in chunks of
+    EXPORT_BATCH_SIZE lines. Rows are read through a server-side cursor (yield_per)
+    and serialized one at a time, so memory stays flat however many rows there are.
+    Uses its own session, since the response body is streamed after the request's
+    session has been closed.
+    """
+    with SessionLocal() as db:
+        lines = []
+        for row in build_query(db).yield_per(EXPORT_BATCH_SIZE):
+            lines.append(response_model.model_validate(row, from_attributes=True).model_dump_json())
+            if len(lines) >= EXPORT_BATCH_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+def export_reviews():
+    """Streams every review as NDJSON."""
+    return stream_ndjson(lambda db: db.query(Review).order_by(Review.id), ReviewResponse)
+
+def export_recruiters():
+    """Streams every recruiter, with its company, as NDJSON."""
+    return stream_ndjson(lambda db: recruiters_query(db).order_by(Recruiter.id), RecruiterResponse)
 
-def get_companies(db: Session):
-    return db.query(Company).all()
+def get_companies(db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    return paginate(db.query(Company), Company.id, limit, cursor)
 
 def delete_company_by_name(db: Session, company_name: str):
     # Check for profanity in company name
@@ -296,82 +608,87 @@ def get_reviews_by_company(db: Session, company_name: str):
     
     return reviews
 
+# Toggles one user's vote on a review and applies the resulting change to the
+# review's counters in a single round trip:
+# - voting the same way again removes the vote
+# - voting the other way flips the existing row through ON CONFLICT
+# - otherwise a new vote row is inserted
+# The counters are adjusted with atomic "upvotes = upvotes + n" style updates,
+# based on what the DELETE/INSERT actually did, so concurrent votes never lose updates.
+# Relies on the uq_review_votes_review_user unique constraint.
+CAST_VOTE_SQL = text("""
+    WITH removed AS (
+        DELETE FROM review_votes
+        WHERE review_id = :review_id AND user_id = :user_id AND vote = :vote
+        RETURNING vote
+    ), upserted AS (
+        INSERT INTO review_votes (review_id, user_id, vote)
+        SELECT :review_id, :user_id, :vote
+        WHERE NOT EXISTS (SELECT 1 FROM removed)
+        ON CONFLICT (review_id, user_id) DO UPDATE SET vote = EXCLUDED.vote
+        WHERE review_votes.vote <> EXCLUDED.vote
+        RETURNING vote, (xmax = 0) AS inserted
+    ), delta AS (
+        SELECT
+            (SELECT COUNT(*) FROM upserted WHERE vote = 1)
+            - (SELECT COUNT(*) FROM removed WHERE vote = 1)
+            - (SELECT COUNT(*) FROM upserted WHERE vote = -1 AND NOT inserted) AS up,
+            (SELECT COUNT(*) FROM upserted WHERE vote = -1)
+            - (SELECT COUNT(*) FROM removed WHERE vote = -1)
+            - (SELECT COUNT(*) FROM upserted WHERE vote = 1 AND NOT inserted) AS down
+    )
+    UPDATE reviews
+    SET upvotes = GREATEST(COALESCE(reviews.upvotes, 0) + delta.up, 0),
+        downvotes = GREATEST(COALESCE(reviews.downvotes, 0) + delta.down, 0)
+    FROM delta
+    WHERE reviews.id = :review_id
+    RETURNING
+        reviews.upvotes,
+        reviews.downvotes,
+        CASE
+            WHEN EXISTS (SELECT 1 FROM removed) THEN 'removed'
+            WHEN EXISTS (SELECT 1 FROM upserted WHERE inserted) THEN 'added'
+            WHEN EXISTS (SELECT 1 FROM upserted) THEN 'changed'
+            ELSE 'unchanged'
+        END AS action
+""")
+
+def cast_review_vote(db: Session, review_id: int, user_id: str, vote: int):
+    """
+    Records a user's upvote (+1) or downvote (-1) on a review, toggling it off if the
+    user already voted the same way, and updates the review's aggregated counts.
+    Returns the action taken ("added", "removed", "changed" or "unchanged") with the new counts.
+    """
+    params = {"review_id": review_id, "user_id": user_id, "vote": vote}
+    try:
+        row = db.execute(CAST_VOTE_SQL, params).one_or_none()
+        if row is None:
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Review not found")
+        db.commit()
+    except IntegrityError:
+        # The vote row's foreign key to the review failed
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Review not found")
+
+    return {"action": row.action, "upvotes": row.upvotes, "downvotes": row.downvotes}
+
 def upvote_review(db: Session, review_id: int, user_id: str):
     """Record an upvote for a review by a given user and update aggregated counts."""
-    review = db.query(Review).filter(Review.id == review_id).first()
-    if not review:
-        raise HTTPException(status_code=404, detail="Review not found")
-    
-    # Check if the user already voted on this review
-    vote_record = db.query(ReviewVote).filter(
-        ReviewVote.review_id == review_id,
-        ReviewVote.user_id == user_id
-    ).first()
-    
     try:
-        if vote_record:
-            if vote_record.vote == 1:
-                # Already upvoted - clear the vote
-                db.delete(vote_record)
-                review.upvotes = max(review.upvotes - 1, 0)
-            else:
-                # Changing vote from downvote (-1) to upvote (+1)
-                vote_record.vote = 1
-                review.downvotes = max(review.downvotes - 1, 0)
-                review.upvotes += 1
-        else:
-            # No vote record exists, create a new upvote record
-            vote_record = ReviewVote(
-                review_id=review_id,
-                user_id=user_id,
-                vote=1
-            )
-            db.add(vote_record)
-            review.upvotes += 1
-
-        db.commit()
-        db.refresh(review)
-        return review
+        return cast_review_vote(db, review_id, user_id, 1)
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to process upvote: {str(e)}")
 
 def downvote_review(db: Session, review_id: int, user_id: str):
     """Record a downvote for a review by a given user and update aggregated counts."""
-    review = db.query(Review).filter(Review.id == review_id).first()
-    if not review:
-        raise HTTPException(status_code=404, detail="Review not found")
-    
-    # Check if the user already voted on this review
-    vote_record = db.query(ReviewVote).filter(
-        ReviewVote.review_id == review_id,
-        ReviewVote.user_id == user_id
-    ).first()
-    
     try:
-        if vote_record:
-            if vote_record.vote == -1:
-                # Already downvoted - clear the vote
-                db.delete(vote_record)
-                review.downvotes = max(review.downvotes - 1, 0)
-            else:
-                # Changing vote from upvote (+1) to downvote (-1)
-                vote_record.vote = -1
-                review.upvotes = max(review.upvotes - 1, 0)
-                review.downvotes += 1
-        else:
-            # No vote record exists, create a new downvote record
-            vote_record = ReviewVote(
-                review_id=review_id,
-                user_id=user_id,
-                vote=-1
-            )
-            db.add(vote_record)
-            review.downvotes += 1
-
-        db.commit()
-        db.refresh(review)
-        return review
+        return cast_review_vote(db, review_id, user_id, -1)
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to process downvote: {str(e)}")
@@ -402,6 +719,9 @@ def update_review(db: Session, review_id: int, review_data: ReviewUpdate):
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     
+    old_ratings = review_ratings(review)
+    old_text = review.text
+    
     # Update only the fields that were provided
     update_data = review_data.dict(exclude_unset=True)
     if "text" in update_data:
@@ -409,33 +729,23 @@ def update_review(db: Session, review_id: int, review_data: ReviewUpdate):
     
     for field, value in update_data.items():
         setattr(review, field, value)
+    text_changed = review.text != old_text
+    if text_changed:
+        review.text_updated_at = datetime.utcnow()
+    
+    # Shift the recruiter's running totals by the change in each rating
+    new_ratings = review_ratings(review)
+    rating_deltas = {field: new_ratings[field] - old_ratings[field] for field in RATING_AGGREGATES}
+    if any(rating_deltas.values()):
+        adjust_rating_aggregates(db, review.recruiter_id, 0, rating_deltas)
     
     db.commit()
     db.refresh(review)
     
-    # Update recruiter's average ratings
-    recruiter = review.recruiter
-    reviews = db.query(Review).filter(Review.recruiter_id == recruiter.id).all()
-    
-    recruiter.avg_resp = sum(r.responsiveness for r in reviews) // len(reviews)
-    recruiter.avg_prof = sum(r.professionalism for r in reviews) // len(reviews)
-    recruiter.avg_help = sum(r.helpfulness for r in reviews) // len(reviews)
-    recruiter.avg_final_stage = sum(r.final_stage for r in reviews) // len(reviews)
-    
-    # Generate summary in the background
-    def generate_summary_bg():
-        try:
-            summary_text = generate_summary(reviews)
-            recruiter.summary = summary_text
-            db.commit()
-        except Exception as e:
-            print(f"Background summary generation failed: {str(e)}")
-    
-    thread = threading.Thread(target=generate_summary_bg)
-    thread.daemon = True
-    thread.start()
+    # Summaries only depend on review texts, so rating-only edits keep the current one
+    if text_changed:
+        schedule_summary(review.recruiter_id)
     
-    db.commit()
     return review
 
 def delete_review(db: Session, review_id: int):
@@ -446,49 +756,33 @@ def delete_review(db: Session, review_id: int):
         raise HTTPException(status_code=404, detail="Review not found")
     
     recruiter_id = review.recruiter_id
+    removed_ratings = review_ratings(review)
     
     # First delete all associated votes to avoid foreign key constraint violations
     db.query(ReviewVote).filter(ReviewVote.review_id == review_id).delete()
     
     try:
-        # Delete the review
+        # Delete the review and take its ratings out of the recruiter's running totals
         db.delete(review)
+        review_count = adjust_rating_aggregates(
+            db, recruiter_id, -1, {field: -value for field, value in removed_ratings.items()}
+        )
+        
+        if review_count == 0:
+            # No reviews left to summarize
+            db.query(Recruiter).filter(Recruiter.id == recruiter_id).update(
+                {"summary": "No reviews available.", "summary_watermark": None,
+                 "summary_max_review_id": None, "summary_review_count": 0},
+                synchronize_session=False
+            )
         db.commit()
         
-        # Update recruiter's average ratings
-        recruiter = db.query(Recruiter).filter(Recruiter.id == recruiter_id).first()
-        if recruiter:
-            reviews = db.query(Review).filter(Review.recruiter_id == recruiter_id).all()
-            if reviews:
-                recruiter.avg_resp = sum(r.responsiveness for r in reviews) // len(reviews)
-                recruiter.avg_prof = sum(r.professionalism for r in reviews) // len(reviews)
-                recruiter.avg_help = sum(r.helpfulness for r in reviews) // len(reviews)
-                recruiter.avg_final_stage = sum(r.final_stage for r in reviews) // len(reviews)
-                
-                # Update summary in the background
-                def update_summary_bg():
-                    try:
-                        summary_text = generate_summary(reviews)
-                        with SessionLocal() as bg_db:
-                            bg_recruiter = bg_db.query(Recruiter).filter(Recruiter.id == recruiter_id).first()
-                            if bg_recruiter:
-                                bg_recruiter.summary = summary_text
-                                bg_db.commit()
-                    except Exception as e:
-                        print(f"Background summary update failed: {str(e)}")
-                
-                thread = threading.Thread(target=update_summary_bg)
-                thread.daemon = True
-                thread.start()
-            else:
-                # If no reviews left, reset averages to 0
-                recruiter.avg_resp = 0
-                recruiter.avg_prof = 0
-                recruiter.avg_help = 0
-                recruiter.avg_final_stage = 0
-                recruiter.summary = "No reviews available."
-            
-            db.commit()
+        if review_count:
+            # Update summary in the background
+            schedule_summary(recruiter_id)
+        else:
+            # Don't let a summary already being generated overwrite the placeholder
+            supersede(summary_job_key(recruiter_id))
         
         return True
     except Exception as e:
@@ -496,11 +790,11 @@ def delete_review(db: Session, review_id: int):
         print(f"Error deleting review: {str(e)}")
         return False
 
-def get_all_recruiters(db: Session):
+def get_all_recruiters(db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
     """
-    Returns all recruiters in the database.
+    Returns one page of recruiters, in id order.
     """
-    return db.query(Recruiter).all()
+    return paginate(recruiters_query(db), Recruiter.id, limit, cursor)
 
 def get_reviews_by_industry(db: Session, industry_id: int):
     """Retrieve all reviews for recruiters at companies in a specific industry."""
@@ -541,9 +835,6 @@ def update_all_company_industries(db: Session, force_update=False):
     If force_update is False, only companies without an industry set will be updated.
     Ensures all companies are categorized using the industry enum integers.
     """
-    import threading
-    from google import infer_company_industry
-    
     # Query companies based on force_update flag
     if force_update:
         companies = db.query(Company).all()
@@ -551,34 +842,58 @@ def update_all_company_industries(db: Session, force_update=False):
         # Only update companies without industry or with industries not as integers
         companies = db.query(Company).filter(
             (Company.industry.is_(None)) | 
-            (~Company.industry.in_([0, 1, 2, 3]))
+            (~Company.industry.in_(VALID_INDUSTRIES))
         ).all()
     
     if not companies:
         return {"message": "No companies to update"}
     
-    def update_company_industry(company_id):
-        """Thread worker function to update a single company's industry"""
-        with SessionLocal() as thread_db:
-            company = thread_db.query(Company).filter(Company.id == company_id).first()
-            if company:
-                industry_str = infer_company_industry(company.name)
-                company.industry = IndustryEnum.from_str(industry_str)
-                thread_db.commit()
-    
-    # Create and start threads for each company update
-    threads = []
-    for company in companies:
-        thread = threading.Thread(target=update_company_industry, args=(company.id,))
-        thread.daemon = True
-        threads.append(thread)
-        thread.start()
-    
-    # Wait for all threads to complete (with a reasonable timeout)
-    for thread in threads:
-        thread.join(timeout=60)
-    
-    return {"message": f"Started industry update for {len(companies)} companies"}
+    # Queue one job per company rather than starting a thread (and a DB connection) per company
+    scheduled = [
+        enqueue_job("infer_industry", block=True, company_id=company.id, force=force_update)
+        for company in companies
+    ]
+    
+    # Jobs running in this process can be waited for (with a reasonable timeout)
+    wait([job for job in scheduled if isinstance(job, Future)], timeout=60)
+    
+    return {"message": f"Started industry update for {sum(1 for job in scheduled if job)} companies"}
+
+@job_handler("infer_industry")
+def infer_industry(company_id: str, force: bool = False):
+    """
+    Job: infers a company's industry from search results and stores it, then
+    invalidates the cached responses that show it. Companies that are already
+    classified are skipped unless force=True. A failed search raises, leaving the
+    industry unchanged so the job is retried.
+    """
+    try:
+        with SessionLocal() as bg_db:
+            company = bg_db.query(Company).filter(Company.id == company_id).first()
+            if not company or (company.industry in VALID_INDUSTRIES and not force):
+                return
+            company_name = company.name
+            old_industry = company.industry
+        industry = IndustryEnum.from_str(infer_company_industry(company_name))
+    finally:
+        # Requests for the same company are coalesced until the job is done, not just
+        # until it starts, so a slow search isn't repeated meanwhile
+        start_coalesced(industry_job_key(company_id))
+
+    with SessionLocal() as bg_db:
+        bg_db.query(Company).filter(Company.id == company_id).update(
+            {"industry": industry}, synchronize_session=False
+        )
+        bg_db.commit()
+        recruiter_ids = [row.id for row in bg_db.query(Recruiter.id).filter(Recruiter.company_id == company_id)]
+
+    if industry != old_industry:
+        # Responses embedding the company, and the industry review listings it moves between
+        keys = ["recruiters:featured", f"reviews:industry:{industry}"]
+        keys += [f"recruiter:{recruiter_id}" for recruiter_id in recruiter_ids]
+        if old_industry is not None:
+            keys.append(f"reviews:industry:{old_industry}")
+        invalidate_cache_sync(keys=keys, families=["companies:all", "recruiters:all", "recruiters:search"])
 
 def get_all_industries(db: Session):
     """
@@ -635,7 +950,7 @@ def get_featured_recruiters(db: Session):
     recruiter_ids = list(set(review.recruiter_id for review in reviews))
     
     # Get the recruiters
-    recruiters = db.query(Recruiter).filter(Recruiter.id.in_(recruiter_ids)).all()
+    recruiters = recruiters_query(db).filter(Recruiter.id.in_(recruiter_ids)).all()
     
     return recruiters
 
@@ -666,4 +981,107 @@ def get_editors_pick_reviews(db: Session):
     return reviews
 
 
+# Async read paths, used by the read endpoints so they run on the event loop
+# instead of holding a threadpool slot while waiting on Postgres
+
+EDITOR_NAMES = ["Aditya Uchil", "Rishi Papani"]
+
+def recruiters_select():
+    """select() counterpart of recruiters_query, loading each recruiter's company in the same SELECT."""
+    return select(Recruiter).options(joinedload(Recruiter.company))
+
+async def paginate_async(db: AsyncSession, statement, id_column, limit: int, cursor: str = None):
+    """Async counterpart of paginate, for select() statements."""
+    statement, limit = keyset_page(statement, id_column, limit, cursor)
+    rows = (await db.scalars(statement)).all()
+    return build_page(rows, id_column, limit)
+
+async def get_recruiter_by_id_async(db: AsyncSession, recruiter_id: str):
+    return (await db.scalars(recruiters_select().where(Recruiter.id == recruiter_id))).first()
+
+async def get_reviews_async(db: AsyncSession, recruiter_id: str):
+    return (await db.scalars(select(Review).where(Review.recruiter_id == recruiter_id))).all()
+
+async def get_reviews_by_company_async(db: AsyncSession, company_name: str):
+    """Retrieve all reviews associated with a specific company."""
+    # Check for profanity in company name
+    if contains_profanity(company_name):
+        raise HTTPException(status_code=400, detail="Company name contains inappropriate language")
+
+    statement = select(Review).join(Recruiter, Review.recruiter_id == Recruiter.id).join(
+        Company, Recruiter.company_id == Company.id
+    ).where(Company.name == company_name)
+    return (await db.scalars(statement)).all()
+
+async def get_reviews_by_industry_async(db: AsyncSession, industry_id: int):
+    """Retrieve all reviews for recruiters at companies in a specific industry."""
+    try:
+        # Validate the industry ID
+        industry_id = int(industry_id)
+        if industry_id not in [0, 1, 2, 3]:
+            return []
+    except (ValueError, TypeError):
+        # Handle case where industry_id can't be converted to int
+        return []
+
+    statement = select(Review).join(Recruiter, Review.recruiter_id == Recruiter.id).join(
+        Company, Recruiter.company_id == Company.id
+    ).where(Company.industry == industry_id)
+    return (await db.scalars(statement)).all()
+
+async def get_all_reviews_async(db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    return await paginate_async(db, select(Review), Review.id, limit, cursor)
+
+async def get_companies_async(db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    return await paginate_async(db, select(Company), Company.id, limit, cursor)
+
+async def get_all_recruiters_async(db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """
+    Returns one page of recruiters, in id order.
+    """
+    return await paginate_async(db, recruiters_select(), Recruiter.id, limit, cursor)
+
+async def get_companies_by_industry_async(db: AsyncSession, industry_id: int):
+    """
+    Retrieve all companies belonging to a specific industry.
+    """
+    try:
+        # Validate the industry ID
+        industry_id = int(industry_id)
+        if industry_id not in [0, 1, 2, 3]:
+            return []
+    except (ValueError, TypeError):
+        # Handle case where industry_id can't be converted to int
+        return []
+
+    return (await db.scalars(select(Company).where(Company.industry == industry_id))).all()
+
+async def get_editor_user_ids_async(db: AsyncSession):
+    """Returns the ids of the editors' accounts (the first user found with each editor's name)."""
+    user_ids = []
+    for name in EDITOR_NAMES:
+        user_id = (await db.scalars(select(User.id).where(User.fullName == name).limit(1))).first()
+        if user_id:
+            user_ids.append(user_id)
+    return user_ids
+
+async def get_featured_recruiters_async(db: AsyncSession):
+    """
+    Returns recruiters reviewed by the editors (Aditya Uchil or Rishi Papani).
+    """
+    user_ids = await get_editor_user_ids_async(db)
+    if not user_ids:
+        return []
+
+    reviewed = select(Review.recruiter_id).where(Review.user_id.in_(user_ids))
+    return (await db.scalars(recruiters_select().where(Recruiter.id.in_(reviewed)))).all()
+
+async def get_editors_pick_reviews_async(db: AsyncSession):
+    """
+    Returns reviews written by the editors (Aditya Uchil or Rishi Papani).
+    """
+    user_ids = await get_editor_user_ids_async(db)
+    if not user_ids:
+        return []
 
+    return (await db.scalars(select(Review).where(Review.user_id.in_(user_ids)))).all()
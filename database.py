@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -17,17 +18,53 @@ if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
 if not DATABASE_URL:
     DATABASE_URL = "postgresql://adityauchil@localhost:5432/recruiterbook"
 
+# Connection budget per process, split between the sync and async engines below so
+# the two pools together never hold more than DB_POOL_SIZE + DB_MAX_OVERFLOW connections.
+# Request reads go through the async engine and get the larger share; writes,
+# background work and scripts use the rest.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "12"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "6"))
+
+if not 0 < DB_ASYNC_POOL_SIZE < DB_POOL_SIZE or not 0 <= DB_ASYNC_MAX_OVERFLOW <= DB_MAX_OVERFLOW:
+    raise ValueError("DB_ASYNC_POOL_SIZE and DB_ASYNC_MAX_OVERFLOW must leave part of DB_POOL_SIZE and DB_MAX_OVERFLOW to the sync engine")
+
 # Configure the engine with optimized connection pooling settings
 engine = create_engine(
     DATABASE_URL, 
-    pool_size=20,               # Maximum number of connections in the pool
-    max_overflow=10,            # Allow 10 connections beyond pool_size when needed
+    pool_size=DB_POOL_SIZE - DB_ASYNC_POOL_SIZE,           # Sync share of the pool (8 by default)
+    max_overflow=DB_MAX_OVERFLOW - DB_ASYNC_MAX_OVERFLOW,  # Sync share of the overflow (4 by default)
     pool_timeout=30,            # Timeout waiting for a connection from pool (seconds)
     pool_recycle=1800,          # Recycle connections after 30 minutes to avoid stale connections
     pool_pre_ping=True          # Verify connection is valid before using it (prevents using broken connections)
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def async_database_url(url):
+    """
+    Returns the asyncpg variant of a database URL. asyncpg takes "ssl" instead of
+    libpq's "sslmode" query parameter.
+    """
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+asyncpg://", 1).replace("sslmode=", "ssl=")
+    elif url.startswith("sqlite://"):
+        url = url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+# Async engine for request handlers that run on the event loop. Scripts and
+# background threads keep using the sync engine above.
+async_engine = create_async_engine(
+    async_database_url(DATABASE_URL),
+    pool_size=DB_ASYNC_POOL_SIZE,
+    max_overflow=DB_ASYNC_MAX_OVERFLOW,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # Initialize database
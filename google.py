@@ -1,51 +1,323 @@
 import requests
 import os
+import asyncio
+import hashlib
+import json
+import random
+import string
+import httpx
+import redis
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import Counter
+from itertools import chain
 from models import IndustryEnum
+from jobs import get_redis
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 SEARCH_ENGINE_ID = os.getenv("SEARCH_ENGINE_ID")
 
-def google_search(query: str):
-    url = "https://www.googleapis.com/customsearch/v1"
-    params = {
+SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+
+# Custom Search requests share one pool of keep-alive connections (GOOGLE_POOL_SIZE
+# per process), time out rather than hang, and are retried with exponential backoff
+# on connection errors, 429 and 5xx responses (honoring Retry-After)
+GOOGLE_CONNECT_TIMEOUT = float(os.getenv("GOOGLE_CONNECT_TIMEOUT", 3.05))
+GOOGLE_READ_TIMEOUT = float(os.getenv("GOOGLE_READ_TIMEOUT", 10))
+GOOGLE_POOL_SIZE = int(os.getenv("GOOGLE_POOL_SIZE", 10))
+GOOGLE_MAX_RETRIES = int(os.getenv("GOOGLE_MAX_RETRIES", 3))
+GOOGLE_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Search results are cached in Redis by normalized query, since the same company
+# and recruiter lookups repeat and every Custom Search call is billed. Queries with
+# no results are cached too, for a shorter time. Errors are never cached.
+SEARCH_CACHE_PREFIX = "recruiterbook-google:"
+SEARCH_CACHE_STATS_KEY = f"{SEARCH_CACHE_PREFIX}stats"
+SEARCH_CACHE_TTL = int(os.getenv("GOOGLE_CACHE_TTL", 7 * 86400))
+SEARCH_NEGATIVE_CACHE_TTL = int(os.getenv("GOOGLE_NEGATIVE_CACHE_TTL", 86400))
+
+# Only these result fields are read, so only these are cached
+RESULT_FIELDS = ("title", "link", "snippet")
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def search_cache_key(query: str) -> str:
+    return SEARCH_CACHE_PREFIX + hashlib.sha256(normalize_query(query).encode()).hexdigest()
+
+def count_search(outcome: str):
+    """Counts a cache hit, negative hit or miss, shared by all processes."""
+    try:
+        get_redis().hincrby(SEARCH_CACHE_STATS_KEY, outcome, 1)
+    except redis.RedisError:
+        pass
+
+def get_cached_search(query: str):
+    try:
+        cached = get_redis().get(search_cache_key(query))
+    except redis.RedisError as e:
+        print(f"Search cache unavailable: {str(e)}")
+        return None
+    return json.loads(cached) if cached is not None else None
+
+def is_cached_search(query: str) -> bool:
+    try:
+        return bool(get_redis().exists(search_cache_key(query)))
+    except redis.RedisError:
+        return False
+
+def cache_search(query: str, data: dict):
+    ttl = SEARCH_CACHE_TTL if data["items"] else SEARCH_NEGATIVE_CACHE_TTL
+    try:
+        get_redis().set(search_cache_key(query), json.dumps(data), ex=ttl)
+    except redis.RedisError as e:
+        print(f"Could not cache search results: {str(e)}")
+
+def get_search_cache_stats():
+    """Returns the search cache's hit, negative hit and miss counts and hit rate across all processes."""
+    try:
+        counts = {key.decode(): int(value) for key, value in get_redis().hgetall(SEARCH_CACHE_STATS_KEY).items()}
+    except redis.RedisError:
+        return {}
+    stats = {outcome: counts.get(outcome, 0) for outcome in ("hits", "negative_hits", "misses")}
+    lookups = sum(stats.values())
+    stats["hit_rate"] = round((stats["hits"] + stats["negative_hits"]) / lookups, 4) if lookups else 0
+    return stats
+
+def create_session() -> requests.Session:
+    retry = Retry(
+        total=GOOGLE_MAX_RETRIES,
+        backoff_factor=GOOGLE_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET"],
+        # Hand the final error response to the caller instead of raising
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GOOGLE_POOL_SIZE, max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+http_session = create_session()
+
+# Opened by the app on startup and closed on shutdown (see open_async_client)
+_async_client = None
+
+def search_params(query: str):
+    return {
         "key": GOOGLE_API_KEY,
         "cx": SEARCH_ENGINE_ID,
         "q": query
     }
-    response = requests.get(url, params=params)
-    return response.json()  
+
+def fetch_search(query: str):
+    response = http_session.get(
+        SEARCH_URL, params=search_params(query), timeout=(GOOGLE_CONNECT_TIMEOUT, GOOGLE_READ_TIMEOUT)
+    )
+    return response.json()
+
+def open_async_client():
+    """Creates the pooled async HTTP client used by google_search_async. Call on the event loop that will use it."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(GOOGLE_READ_TIMEOUT, connect=GOOGLE_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=GOOGLE_POOL_SIZE, max_keepalive_connections=GOOGLE_POOL_SIZE),
+            # Connection failures are retried by the transport, responses by fetch_search_async
+            transport=httpx.AsyncHTTPTransport(retries=GOOGLE_MAX_RETRIES),
+        )
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+async def fetch_search_async(query: str):
+    """Async fetch_search, retrying 429 and 5xx responses with exponential backoff and jitter."""
+    if _async_client is None:
+        raise RuntimeError("open_async_client() must be called before google_search_async")
+    for attempt in range(GOOGLE_MAX_RETRIES + 1):
+        response = await _async_client.get(SEARCH_URL, params=search_params(query))
+        if response.status_code not in RETRY_STATUSES or attempt == GOOGLE_MAX_RETRIES:
+            break
+        retry_after = response.headers.get("Retry-After", "")
+        delay = float(retry_after) if retry_after.isdigit() else GOOGLE_BACKOFF_FACTOR * 2 ** attempt
+        await asyncio.sleep(delay * random.uniform(0.5, 1))
+    return response.json()
+
+class SearchError(Exception):
+    """Custom Search returned an API error, e.g. an exhausted quota or a rate limit."""
+
+def results_to_cache(data: dict):
+    """Keeps only the result fields that are read."""
+    return {"items": [{field: item.get(field, "") for field in RESULT_FIELDS} for item in data.get("items", [])]}
+
+def google_search(query: str):
+    """Returns Custom Search results for a query, from the search cache when possible."""
+    cached = get_cached_search(query)
+    if cached is not None:
+        count_search("hits" if cached["items"] else "negative_hits")
+        return cached
+
+    count_search("misses")
+    data = fetch_search(query)
+    if "error" in data:
+        # Quota or API errors: return them to the caller as before, but don't cache them
+        return data
+    data = results_to_cache(data)
+    cache_search(query, data)
+    return data
+
+async def google_search_async(query: str):
+    """google_search for use on an event loop: the request is awaited, and the Redis cache calls run in a thread."""
+    cached = await asyncio.to_thread(get_cached_search, query)
+    if cached is not None:
+        await asyncio.to_thread(count_search, "hits" if cached["items"] else "negative_hits")
+        return cached
+
+    await asyncio.to_thread(count_search, "misses")
+    data = await fetch_search_async(query)
+    if "error" in data:
+        return data
+    data = results_to_cache(data)
+    await asyncio.to_thread(cache_search, query, data)
+    return data
+
+# Keywords related to recruiting roles
+RECRUITING_KEYWORDS = [
+    "recruiter", "talent", "hiring", "recruitment", "sourcing",
+    "hr", "human resources", "people operations", "talent acquisition",
+    "staffing", "personnel", "talent partner"
+]
+
+# Limit industry categories to the four required ones
+INDUSTRY_KEYWORDS = {
+    "tech": ["tech", "technology", "software", "hardware", "information technology",
+            "digital", "computing", "electronics", "saas", "cloud", "telecommunications",
+            "internet", "app", "platform", "development", "coding", "artificial intelligence", "ai"],
+    "finance": ["finance", "financial", "banking", "investment", "insurance", "wealth management",
+               "fintech", "capital", "broker", "trading", "bank", "asset management", "private equity",
+               "venture capital", "mortgage", "credit"],
+    "consulting": ["consulting", "consultant", "advisory", "professional services",
+                 "business consulting", "management consulting", "strategy consulting",
+                 "solutions provider", "business solutions", "advisory services"],
+    "healthcare": ["healthcare", "health", "medical", "pharmaceutical", "biotech", "life sciences",
+                 "hospital", "wellness", "medicine", "clinical", "therapeutics", "patient care",
+                 "health services", "pharma", "health tech"]
+}
+
+# Characters that separate words for the keyword matcher; phrases match across any of them
+WORD_SEPARATORS = str.maketrans(dict.fromkeys(string.punctuation + "–—‘’“”…·", " "))
+
+def keyword_forms(keyword: str):
+    """
+    Returns the forms of `keyword` that count as a match, inflecting its last word:
+    as is, plural ("banks", "technologies", "businesses") and -ing ("financing").
+    """
+    *head, last = keyword.split()
+    forms = [last]
+    if last.endswith("y") and last[-2:-1] not in ("a", "e", "i", "o", "u"):
+        forms.append(last[:-1] + "ies")
+    elif last.endswith(("ss", "x", "z", "ch", "sh")):
+        forms.append(last + "es")
+    elif not last.endswith("s"):
+        forms.append(last + "s")
+    if not last.endswith("ing"):
+        forms.append((last[:-1] if last.endswith("e") else last) + "ing")
+    return [" ".join(head + [form]) for form in forms]
+
+class KeywordMatcher:
+    """
+    Scores text against keyword categories. Keywords only match whole words (so "app"
+    doesn't match "apple", nor "hr" "three"), case-insensitively and in any of their
+    keyword_forms ("technologies" counts as "technology"), and the longest keyword
+    wins where keywords overlap ("health tech" counts for healthcare, not also for tech).
+    Text is split into words once and looked up with set operations, so scoring stays
+    cheap however many keywords there are.
+    """
+
+    def __init__(self, categories: dict):
+        self.keyword_categories = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self.keyword_categories.setdefault(keyword.lower(), []).append(category)
+        # Each form maps to its keyword; keywords come first, so "banking" stays its own
+        # keyword rather than a form of "bank"
+        self.forms = {keyword: keyword for keyword in self.keyword_categories}
+        for keyword in self.keyword_categories:
+            for form in keyword_forms(keyword):
+                self.forms.setdefault(form, keyword)
+        self.word_forms = {form: keyword for form, keyword in self.forms.items() if " " not in form}
+        # Multi-word forms, space-padded for whole-word substring checks, by their first word
+        self.phrase_forms = {}
+        self.phrase_keywords = {}
+        for form, keyword in self.forms.items():
+            if " " in form:
+                self.phrase_forms.setdefault(form.split()[0], []).append(f" {form} ")
+                self.phrase_keywords[f" {form} "] = keyword
+
+    def keywords(self, text: str) -> set:
+        """Returns the distinct keywords found in `text`."""
+        # Punctuation becomes spaces, so "health-tech" reads as "health tech"
+        spaced = f" {text.lower().translate(WORD_SEPARATORS)} "
+        words = spaced.split()
+        found = set()
+        phrases = [
+            phrase for first in self.phrase_forms.keys() & words
+            for phrase in self.phrase_forms[first] if phrase in spaced
+        ]
+        if phrases:
+            # Longest first, and each is taken out of the text so the shorter keywords
+            # inside it don't count too
+            phrases.sort(key=len, reverse=True)
+            for phrase in phrases:
+                if phrase in spaced:
+                    found.add(self.phrase_keywords[phrase])
+                    while phrase in spaced:
+                        spaced = spaced.replace(phrase, " | ")
+            words = spaced.split()
+        found.update(map(self.word_forms.__getitem__, self.word_forms.keys() & words))
+        return found
+
+    def scores(self, text: str) -> Counter:
+        """Returns the number of distinct keywords of each category found in `text`."""
+        return Counter(chain.from_iterable(map(self.keyword_categories.__getitem__, self.keywords(text))))
+
+    def matches(self, text: str) -> bool:
+        return bool(self.keywords(text))
+
+RECRUITING_MATCHER = KeywordMatcher({"recruiting": RECRUITING_KEYWORDS})
+INDUSTRY_MATCHER = KeywordMatcher(INDUSTRY_KEYWORDS)
+
+def recruiter_query(name: str, company: str) -> str:
+    return f"{name} {company}"
+
+def industry_query(company_name: str) -> str:
+    return f"{company_name} industry sector"
 
 def verify_recruiter(name: str, company: str) -> bool:
-    query = f"{name} {company}"
-    data = google_search(query)
+    data = google_search(recruiter_query(name, company))
 
     items = data.get("items", [])
     if not items:
         return False
     
-    # Keywords related to recruiting roles
-    recruiting_keywords = [
-        "recruiter", "talent", "hiring", "recruitment", "sourcing", 
-        "hr", "human resources", "people operations", "talent acquisition",
-        "staffing", "personnel", "talent partner"
-    ]
-    
     for item in items:
-        snippet = item.get("snippet", "").lower()
+        snippet = item.get("snippet", "")
         link = item.get("link", "").lower()
-        title = item.get("title", "").lower()
+        title = item.get("title", "")
         
         # Check for LinkedIn profile which is a strong indicator
         if "linkedin.com/in/" in link:
             # Check if any recruiting keyword is in the snippet or title
-            for keyword in recruiting_keywords:
-                if keyword in snippet or keyword in title:
-                    return True
+            if RECRUITING_MATCHER.matches(snippet) or RECRUITING_MATCHER.matches(title):
+                return True
                     
         # Also check non-LinkedIn results for recruiting keywords
-        for keyword in recruiting_keywords:
-            if keyword in snippet:
-                return True
+        if RECRUITING_MATCHER.matches(snippet):
+            return True
 
     return False
 
@@ -54,43 +326,26 @@ def infer_company_industry(company_name: str) -> str:
     Uses Google Search to infer a company's industry based on search results.
     Returns the industry as a string for backward compatibility.
     The caller should convert to enum integer using IndustryEnum.from_str().
+    Raises SearchError on an API error (and requests' exceptions on network errors)
+    rather than guessing, so a failed search never decides the industry.
     """
-    query = f"{company_name} industry sector"
-    data = google_search(query)
+    data = google_search(industry_query(company_name))
+    if "error" in data:
+        error = data["error"]
+        raise SearchError(error.get("message", error) if isinstance(error, dict) else error)
     
     items = data.get("items", [])
     if not items:
         return "Tech"  # Default to Tech
     
-    # Limit industry categories to the four required ones
-    industry_keywords = {
-        "tech": ["tech", "technology", "software", "hardware", "it ", "information technology", 
-                "digital", "computing", "electronics", "saas", "cloud", "telecommunications",
-                "internet", "app", "platform", "development", "coding", "artificial intelligence", "AI"],
-        "finance": ["finance", "financial", "banking", "investment", "insurance", "wealth management", 
-                   "fintech", "capital", "broker", "trading", "bank", "asset management", "private equity",
-                   "venture capital", "mortgage", "credit"],
-        "consulting": ["consulting", "consultant", "advisory", "professional services", 
-                     "business consulting", "management consulting", "strategy consulting", 
-                     "solutions provider", "business solutions", "advisory services"],
-        "healthcare": ["healthcare", "health", "medical", "pharmaceutical", "biotech", "life sciences", 
-                     "hospital", "wellness", "medicine", "clinical", "therapeutics", "patient care",
-                     "health services", "pharma", "health tech"]
-    }
-    
-    # Count matches for each industry category
-    industry_matches = {industry: 0 for industry in industry_keywords}
+    # Count keyword matches for each industry category
+    industry_matches = {industry: 0 for industry in INDUSTRY_KEYWORDS}
     
     # Analyze snippets and titles from search results
     for item in items:
-        snippet = item.get("snippet", "").lower()
-        title = item.get("title", "").lower()
-        combined_text = snippet + " " + title
-        
-        for industry, keywords in industry_keywords.items():
-            for keyword in keywords:
-                if keyword in combined_text:
-                    industry_matches[industry] += 1
+        combined_text = item.get("snippet", "") + " " + item.get("title", "")
+        for industry, score in INDUSTRY_MATCHER.scores(combined_text).items():
+            industry_matches[industry] += score
     
     # Find the industry with the most matches
     best_match = max(industry_matches.items(), key=lambda x: x[1])
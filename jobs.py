@@ -0,0 +1,307 @@
+"""
+Background jobs: summary regeneration, recruiter verification and industry inference.
+
+With JOB_QUEUE_BACKEND=redis, jobs are pushed onto a Redis list and run by the
+separate worker process (worker.py, the Procfile "worker" entry), so they survive
+web restarts and don't compete with requests for CPU. Failed jobs are retried with
+exponential backoff, and moved to a dead-letter list after JOB_MAX_ATTEMPTS.
+
+Coalesced jobs (schedule_coalesced) run once per key per debounce window, however
+many times they are scheduled, and carry a generation number so a run that was
+overtaken by newer changes can discard its result.
+
+With the default JOB_QUEUE_BACKEND=thread, jobs run on the web process's bounded
+background executor, as before.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+import redis
+
+from background import background_executor
+
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "thread").lower()
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BASE_SECONDS = int(os.getenv("JOB_RETRY_BASE_SECONDS", 10))
+
+JOB_PREFIX = "recruiterbook-jobs:"
+QUEUE_KEY = f"{JOB_PREFIX}queue"
+DELAYED_KEY = f"{JOB_PREFIX}delayed"
+DEAD_KEY = f"{JOB_PREFIX}dead"
+PROCESSING_PREFIX = f"{JOB_PREFIX}processing:"
+HEARTBEAT_PREFIX = f"{JOB_PREFIX}heartbeat:"
+
+# A worker whose heartbeat is older than this is considered dead, and the jobs
+# it was running are put back on the queue
+HEARTBEAT_SECONDS = 30
+
+# Seconds a worker blocks waiting for a job before doing housekeeping
+POLL_SECONDS = 5
+
+# Coalesced jobs: generation counter and "run already scheduled" marker per key
+GENERATION_PREFIX = f"{JOB_PREFIX}generation:"
+PENDING_PREFIX = f"{JOB_PREFIX}pending:"
+
+# How long a pending marker outlives its debounce window, in case the scheduled run is lost
+PENDING_GRACE_SECONDS = 3600
+
+# Registered job functions by name, see job_handler
+JOB_HANDLERS = {}
+
+_redis = None
+
+# Coalescing state for the thread backend
+_local_lock = threading.Lock()
+_local_generations = {}
+_local_pending = set()
+
+
+def job_handler(name: str):
+    """Registers a function as the handler for jobs called `name`."""
+    def decorator(func):
+        JOB_HANDLERS[name] = func
+        return func
+    return decorator
+
+
+def get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"))
+    return _redis
+
+
+def run_in_process(name: str, block: bool = False, **args):
+    """Runs a job on this process's background executor. Returns its Future, or None if rejected."""
+    return background_executor.submit(JOB_HANDLERS[name], name=name, block=block, timeout=60, **args)
+
+
+def enqueue_job(name: str, block: bool = False, delay: float = 0, **args):
+    """
+    Schedules the job `name` with keyword arguments `args`, to run no sooner than
+    `delay` seconds from now.
+    Returns the job id when queued in Redis, or the executor Future when run in process
+    (waiting for room in the executor's queue if block=True; delayed in-process jobs
+    return None).
+    If Redis is unavailable the job runs in process rather than being lost.
+    """
+    if name not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job: {name}")
+    if JOB_QUEUE_BACKEND != "redis":
+        if delay > 0:
+            timer = threading.Timer(delay, run_in_process, args=(name,), kwargs=args)
+            timer.daemon = True
+            timer.start()
+            return None
+        return run_in_process(name, block=block, **args)
+
+    job = {"id": uuid.uuid4().hex, "name": name, "args": args, "attempts": 0, "enqueued_at": time.time()}
+    try:
+        if delay > 0:
+            get_redis().zadd(DELAYED_KEY, {json.dumps(job): time.time() + delay})
+        else:
+            get_redis().lpush(QUEUE_KEY, json.dumps(job))
+    except redis.RedisError as e:
+        print(f"Job queue unavailable, running {name} in process: {str(e)}")
+        return run_in_process(name, block=block, **args)
+    return job["id"]
+
+
+def schedule_coalesced(name: str, key: str, delay: float, **args):
+    """
+    Schedules the job `name` to run `delay` seconds from now, unless a run for `key`
+    is already scheduled, so a burst of calls within the window leads to one run.
+    Every call bumps the key's generation, which tells a run that is already in
+    progress that its result is out of date (see start_coalesced and is_current).
+    """
+    if JOB_QUEUE_BACKEND == "redis":
+        try:
+            pipe = get_redis().pipeline()
+            pipe.incr(f"{GENERATION_PREFIX}{key}")
+            pipe.set(f"{PENDING_PREFIX}{key}", 1, nx=True, ex=int(delay) + PENDING_GRACE_SECONDS)
+            _, scheduled = pipe.execute()
+        except redis.RedisError as e:
+            print(f"Job queue unavailable, running {name} in process: {str(e)}")
+            return run_in_process(name, **args)
+    else:
+        with _local_lock:
+            _local_generations[key] = _local_generations.get(key, 0) + 1
+            scheduled = key not in _local_pending
+            _local_pending.add(key)
+
+    if not scheduled:
+        return None
+    if JOB_QUEUE_BACKEND == "redis":
+        return enqueue_job(name, delay=delay, **args)
+    return _run_coalesced_in_process(name, key, delay, args)
+
+
+def _run_coalesced_in_process(name: str, key: str, delay: float, args: dict):
+    """
+    Runs a coalesced job on this process's executor after `delay` seconds. If the
+    executor rejects it, the key's pending marker is cleared so the next call tries again.
+    """
+    if name not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job: {name}")
+
+    def run():
+        future = run_in_process(name, **args)
+        if future is None:
+            with _local_lock:
+                _local_pending.discard(key)
+        return future
+
+    if delay > 0:
+        timer = threading.Timer(delay, run)
+        timer.daemon = True
+        timer.start()
+        return None
+    return run()
+
+
+def supersede(key: str):
+    """Bumps the generation of `key` without scheduling a run, so runs in progress discard their result."""
+    if JOB_QUEUE_BACKEND == "redis":
+        try:
+            get_redis().incr(f"{GENERATION_PREFIX}{key}")
+        except redis.RedisError as e:
+            print(f"Could not supersede jobs for {key}: {str(e)}")
+    else:
+        with _local_lock:
+            _local_generations[key] = _local_generations.get(key, 0) + 1
+
+
+def start_coalesced(key: str) -> int:
+    """
+    Called by a coalesced job as it starts. Clears the key's pending marker, so later
+    changes schedule a new run, and returns the generation this run works from.
+    """
+    if JOB_QUEUE_BACKEND == "redis":
+        try:
+            pipe = get_redis().pipeline()
+            pipe.delete(f"{PENDING_PREFIX}{key}")
+            pipe.get(f"{GENERATION_PREFIX}{key}")
+            _, generation = pipe.execute()
+            return int(generation or 0)
+        except redis.RedisError as e:
+            print(f"Could not read job generation for {key}: {str(e)}")
+            return 0
+    with _local_lock:
+        _local_pending.discard(key)
+        return _local_generations.get(key, 0)
+
+
+def is_current(key: str, generation: int) -> bool:
+    """True unless `key` was scheduled or superseded again since start_coalesced returned `generation`."""
+    if JOB_QUEUE_BACKEND == "redis":
+        try:
+            return int(get_redis().get(f"{GENERATION_PREFIX}{key}") or 0) == generation
+        except redis.RedisError as e:
+            # Better to write a possibly stale result than to drop it
+            print(f"Could not read job generation for {key}: {str(e)}")
+            return True
+    with _local_lock:
+        return _local_generations.get(key, 0) == generation
+
+
+class JobWorker:
+    """
+    Pulls jobs from the Redis queue and runs them one at a time.
+
+    Each job is atomically moved to this worker's processing list while it runs
+    (the reliable queue pattern), so a job is never lost if the worker dies
+    mid-job: another worker notices the missing heartbeat and requeues it.
+    """
+
+    def __init__(self, client=None):
+        self.redis = client or get_redis()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.processing_key = f"{PROCESSING_PREFIX}{self.worker_id}"
+        self.heartbeat_key = f"{HEARTBEAT_PREFIX}{self.worker_id}"
+        self.running = True
+
+    def heartbeat(self):
+        self.redis.set(self.heartbeat_key, int(time.time()), ex=HEARTBEAT_SECONDS)
+
+    def _heartbeat_loop(self):
+        # Runs on its own thread so long jobs don't make the worker look dead
+        while self.running:
+            try:
+                self.heartbeat()
+            except redis.RedisError as e:
+                print(f"Job worker heartbeat failed: {str(e)}")
+            time.sleep(HEARTBEAT_SECONDS / 3)
+
+    def recover_orphaned_jobs(self):
+        """Requeues jobs left in the processing lists of workers that stopped heartbeating."""
+        for key in self.redis.scan_iter(match=f"{PROCESSING_PREFIX}*"):
+            worker_id = key.decode()[len(PROCESSING_PREFIX):]
+            if worker_id == self.worker_id or self.redis.exists(f"{HEARTBEAT_PREFIX}{worker_id}"):
+                continue
+            recovered = 0
+            while self.redis.lmove(key, QUEUE_KEY, "RIGHT", "LEFT"):
+                recovered += 1
+            if recovered:
+                print(f"Requeued {recovered} jobs from stopped worker {worker_id}")
+
+    def promote_delayed_jobs(self):
+        """Moves retries whose backoff has elapsed back onto the queue."""
+        for payload in self.redis.zrangebyscore(DELAYED_KEY, 0, time.time(), start=0, num=100):
+            # Only the worker that removes the entry requeues it
+            if self.redis.zrem(DELAYED_KEY, payload):
+                self.redis.lpush(QUEUE_KEY, payload)
+
+    def fail(self, job, error: str):
+        """Schedules a retry with exponential backoff, or dead-letters the job after JOB_MAX_ATTEMPTS."""
+        job["attempts"] += 1
+        job["last_error"] = error
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            print(f"Job {job['name']} {job['id']} failed {job['attempts']} times, moving to dead-letter list: {error}")
+            self.redis.lpush(DEAD_KEY, json.dumps(job))
+        else:
+            delay = JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+            print(f"Job {job['name']} {job['id']} failed, retrying in {delay}s: {error}")
+            self.redis.zadd(DELAYED_KEY, {json.dumps(job): time.time() + delay})
+
+    def run_one(self, payload: bytes):
+        job = json.loads(payload)
+        try:
+            handler = JOB_HANDLERS.get(job["name"])
+            if handler is None:
+                raise ValueError(f"Unknown job: {job['name']}")
+            handler(**job["args"])
+        except Exception as e:
+            self.fail(job, str(e))
+        finally:
+            self.redis.lrem(self.processing_key, 1, payload)
+
+    def run(self):
+        """Processes jobs until stop() is called. The current job always finishes first."""
+        print(f"Job worker {self.worker_id} started with jobs: {', '.join(sorted(JOB_HANDLERS))}")
+        self.heartbeat()
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+
+        last_housekeeping = 0
+        while self.running:
+            try:
+                if time.time() - last_housekeeping >= POLL_SECONDS:
+                    self.promote_delayed_jobs()
+                    self.recover_orphaned_jobs()
+                    last_housekeeping = time.time()
+
+                payload = self.redis.blmove(QUEUE_KEY, self.processing_key, POLL_SECONDS, "RIGHT", "LEFT")
+                if payload is not None:
+                    self.run_one(payload)
+            except redis.RedisError as e:
+                print(f"Job worker lost its Redis connection: {str(e)}")
+                time.sleep(POLL_SECONDS)
+
+        self.redis.delete(self.heartbeat_key)
+        print(f"Job worker {self.worker_id} stopped")
+
+    def stop(self, *_):
+        self.running = False
@@ -1,18 +1,24 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, Request, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, Base
-from crud import downvote_review, get_or_create_user, get_or_create_recruiter, find_recruiters, get_reviews_by_company, post_review, get_reviews, get_companies, get_recruiter_by_id, delete_company_by_name, get_all_reviews, upvote_review, get_reviews_by_user, get_user_helpfulness_score, update_review, delete_review, get_all_recruiters, get_reviews_by_industry, update_all_company_industries, get_all_industries, get_companies_by_industry, get_featured_recruiters, get_editors_pick_reviews
-from schemas import UserCreate, UserResponse, RecruiterCreate, RecruiterResponse, ReviewCreate, ReviewResponse, CompanyResponse, HelpfulnessScore, ReviewUpdate, IndustryResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SessionLocal, AsyncSessionLocal, engine, async_engine, Base
+from crud import downvote_review, get_or_create_user, get_or_create_recruiter, find_recruiters, post_review, delete_company_by_name, upvote_review, get_reviews_by_user, get_user_helpfulness_score, update_review, delete_review, update_all_company_industries, get_all_industries, get_review_cache_scopes, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, export_reviews, export_recruiters, get_recruiter_by_id_async, get_reviews_by_company_async, get_reviews_by_industry_async, get_reviews_async, get_companies_async, get_all_recruiters_async, get_featured_recruiters_async, get_editors_pick_reviews_async, get_all_reviews_async, get_companies_by_industry_async, RECRUITER_SEARCH_ENGINE
+from schemas import UserCreate, UserResponse, RecruiterCreate, RecruiterResponse, ReviewCreate, ReviewResponse, CompanyResponse, HelpfulnessScore, ReviewUpdate, IndustryResponse, CompanyPage, RecruiterPage, ReviewPage
 from models import Review, IndustryEnum
-from typing import List
+from typing import List, Optional
 import uvicorn
 import os
 from auth import get_current_user_from_cookie, router as auth_router
 from starlette.middleware.sessions import SessionMiddleware
-from cache import setup_cache, invalidate_cache_keys, invalidate_all_cache
-from fastapi_cache.decorator import cache
+from cache import setup_cache, shutdown_cache, cached, invalidate_cache, invalidate_all_cache, get_cache_stats
+from vote_buffer import VOTE_BATCHING_ENABLED, vote_buffer
+from background import background_executor
+from google import get_search_cache_stats, open_async_client, close_async_client
+from search_index import warm_recruiter_index
 
 # Import slowapi for rate limiting
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -53,10 +59,49 @@ app.add_middleware(SessionMiddleware, secret_key="YOUR_RANDOM_SECRET")
 # Initialize DB
 Base.metadata.create_all(bind=engine)
 
+def load_review_cache_scopes(review_ids=None, recruiter_ids=None):
+    with SessionLocal() as db:
+        return get_review_cache_scopes(db, review_ids=review_ids, recruiter_ids=recruiter_ids)
+
+async def invalidate_review_caches(review_ids=None, recruiter_ids=None):
+    """
+    Invalidate cached responses listing the given reviews, or any review of the given
+    recruiters. Review writes also change a recruiter's ratings and summary, so passing
+    recruiter_ids invalidates their profiles and the recruiter lists as well.
+    """
+    scopes = await run_in_threadpool(load_review_cache_scopes, review_ids, recruiter_ids)
+    keys = ["reviews:editors-picks"]
+    for recruiter_id, company_name, industry in scopes:
+        keys += [
+            f"reviews:recruiter:{recruiter_id}",
+            f"reviews:company:{company_name}",
+            f"reviews:industry:{industry}"
+        ]
+    families = ["reviews:all"]
+    if recruiter_ids:
+        keys += ["recruiters:featured"] + [f"recruiter:{recruiter_id}" for recruiter_id in recruiter_ids]
+        families += ["recruiters:all", "recruiters:search"]
+    await invalidate_cache(keys, families)
+
 # Setup cache on application startup
 @app.on_event("startup")
 async def startup_event():
     await setup_cache()
+    open_async_client()
+    if RECRUITER_SEARCH_ENGINE == "index":
+        warm_recruiter_index()
+    if VOTE_BATCHING_ENABLED:
+        vote_buffer.start(on_flush=invalidate_review_caches)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if VOTE_BATCHING_ENABLED:
+        await vote_buffer.stop(on_flush=invalidate_review_caches)
+    # Let queued background work finish before the process exits
+    await run_in_threadpool(background_executor.shutdown)
+    await shutdown_cache()
+    await close_async_client()
+    await async_engine.dispose()
 
 # Dependency: Get DB session
 def get_db():
@@ -66,6 +111,11 @@ def get_db():
     finally:
         db.close()
 
+# Dependency: Get async DB session, for read endpoints running on the event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Function to get user ID for rate limiting (used for authenticated endpoints)
 def get_user_id_for_limiter(request: Request):
     try:
@@ -84,40 +134,40 @@ def create_or_get_user(user: UserCreate, db: Session = Depends(get_db), request:
     result = get_or_create_user(db, user)
     # Invalidate any cached user data
     if background_tasks:
-        background_tasks.add_task(invalidate_cache_keys, ["*user*"])
+        background_tasks.add_task(invalidate_cache, ["recruiters:featured", "reviews:editors-picks"])
     return result
 
 # Find Recruiter
 @app.get("/recruiter/", response_model=List[RecruiterResponse])
-@cache(expire=600)  # Cache for 10 minutes
+@cached("recruiters:search:{fullName}:{company}", "recruiters:search", soft_ttl=600)  # Fresh for 10 minutes, served stale for up to 20 minutes
 def find_recruiter(fullName: str, company: str = None, db: Session = Depends(get_db)):
     return find_recruiters(db, fullName, company)
 
 @app.get("/recruiter/{recruiter_id}", response_model=RecruiterResponse)
-@cache(expire=1800)  # Cache for 30 minutes
-def get_recruiter(recruiter_id: str, db: Session = Depends(get_db)):
-    recruiter = get_recruiter_by_id(db, recruiter_id)
+@cached("recruiter:{recruiter_id}", soft_ttl=1800)  # Fresh for 30 minutes, served stale for up to 1 hour
+async def get_recruiter(recruiter_id: str, db: AsyncSession = Depends(get_async_db)):
+    recruiter = await get_recruiter_by_id_async(db, recruiter_id)
     if not recruiter:
         raise HTTPException(status_code=404, detail="Recruiter not found")
     return recruiter
 
 @app.get("/reviews/company/{company_name}", response_model=List[ReviewResponse])
-@cache(expire=1800)  # Cache for 30 minutes
-def get_reviews_for_company(company_name: str, db: Session = Depends(get_db)):
-    reviews = get_reviews_by_company(db, company_name)
+@cached("reviews:company:{company_name}", soft_ttl=1800)  # Fresh for 30 minutes, served stale for up to 1 hour
+async def get_reviews_for_company(company_name: str, db: AsyncSession = Depends(get_async_db)):
+    reviews = await get_reviews_by_company_async(db, company_name)
     if not reviews:
         raise HTTPException(status_code=404, detail="No reviews found for this company")
     return reviews
 
 @app.get("/reviews/industry/{industry_id}", response_model=List[ReviewResponse])
-@cache(expire=3600)  # Cache for 1 hour
-def get_reviews_by_industry_endpoint(industry_id: int, db: Session = Depends(get_db)):
+@cached("reviews:industry:{industry_id}", soft_ttl=3600)  # Fresh for 1 hour, served stale for up to 2 hours
+async def get_reviews_by_industry_endpoint(industry_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve all reviews for recruiters at companies in a specific industry.
     Industry ID is an integer:
     0 = Tech, 1 = Finance, 2 = Consulting, 3 = Healthcare
     """
-    reviews = get_reviews_by_industry(db, industry_id)
+    reviews = await get_reviews_by_industry_async(db, industry_id)
     return reviews
 
 # Create Recruiter - Add rate limiting per user
@@ -132,10 +182,10 @@ def create_recruiter(
     result = get_or_create_recruiter(db, recruiter)
     # Invalidate related caches
     if background_tasks:
-        background_tasks.add_task(invalidate_cache_keys, [
-            "*recruiter*", 
-            f"*company*{result.company.name}*"
-        ])
+        background_tasks.add_task(invalidate_cache, [
+            "recruiters:featured",
+            f"recruiter:{result.id}"
+        ], ["recruiters:all", "recruiters:search", "companies:all"])
     return result
 
 # Post Review
@@ -164,11 +214,7 @@ def create_review(
         
         # Invalidate related caches
         if background_tasks:
-            background_tasks.add_task(invalidate_cache_keys, [
-                f"*recruiter*{new_review.recruiter_id}*",
-                f"*reviews*",
-                f"*allReviews*"
-            ])
+            background_tasks.add_task(invalidate_review_caches, recruiter_ids=[new_review.recruiter_id])
         
         return new_review
     except HTTPException as e:
@@ -180,38 +226,52 @@ def create_review(
 
 # Get Reviews
 @app.get("/reviews/", response_model=List[ReviewResponse])
-@cache(expire=1800)  # Cache for 30 minutes
-def get_reviews_for_recruiter(recruiter_id: str, db: Session = Depends(get_db)):
-    return get_reviews(db, recruiter_id)
+@cached("reviews:recruiter:{recruiter_id}", soft_ttl=1800)  # Fresh for 30 minutes, served stale for up to 1 hour
+async def get_reviews_for_recruiter(recruiter_id: str, db: AsyncSession = Depends(get_async_db)):
+    return await get_reviews_async(db, recruiter_id)
 
 # Get All Companies
-@app.get("/companies/", response_model=List[CompanyResponse])
-@cache(expire=3600)  # Cache for 1 hour
-def get_all_companies(db: Session = Depends(get_db)):
-    return get_companies(db)
-
-@app.get("/recruiters/", response_model=List[RecruiterResponse])
-@cache(expire=3600)  # Cache for 1 hour
-def get_all_recruiters_endpoint(db: Session = Depends(get_db)):
-    return get_all_recruiters(db)
+@app.get("/companies/", response_model=CompanyPage)
+@cached("companies:all:{limit}:{cursor}", "companies:all", soft_ttl=3600)  # Fresh for 1 hour, served stale for up to 2 hours
+async def get_all_companies(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns one page of companies. Pass the returned next_cursor to get the next page.
+    """
+    return await get_companies_async(db, limit=limit, cursor=cursor)
+
+@app.get("/recruiters/", response_model=RecruiterPage)
+@cached("recruiters:all:{limit}:{cursor}", "recruiters:all", soft_ttl=3600)  # Fresh for 1 hour, served stale for up to 2 hours
+async def get_all_recruiters_endpoint(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns one page of recruiters. Pass the returned next_cursor to get the next page.
+    """
+    return await get_all_recruiters_async(db, limit=limit, cursor=cursor)
 
 @app.get("/recruiters/featured/", response_model=List[RecruiterResponse])
-@cache(expire=7200)  # Cache for 2 hours
-def get_featured_recruiters_endpoint(db: Session = Depends(get_db)):
+@cached("recruiters:featured", soft_ttl=7200)  # Fresh for 2 hours, served stale for up to 4 hours
+async def get_featured_recruiters_endpoint(db: AsyncSession = Depends(get_async_db)):
     """
     Returns recruiters that have been added by either Aditya Uchil or Rishi Papani.
     These are considered featured recruiters in the system.
     """
-    return get_featured_recruiters(db)
+    return await get_featured_recruiters_async(db)
 
 @app.get("/editors-picks/", response_model=List[ReviewResponse])
-@cache(expire=7200)  # Cache for 2 hours
-def get_editors_pick_reviews_endpoint(db: Session = Depends(get_db)):
+@cached("reviews:editors-picks", soft_ttl=7200)  # Fresh for 2 hours, served stale for up to 4 hours
+async def get_editors_pick_reviews_endpoint(db: AsyncSession = Depends(get_async_db)):
     """
     Returns reviews written by Aditya Uchil or Rishi Papani.
     These are considered editor's picks.
     """
-    return get_editors_pick_reviews(db)
+    return await get_editors_pick_reviews_async(db)
 
 @app.delete("/company/{company_name}")
 @limiter.limit("10/minute", key_func=get_user_id_for_limiter)
@@ -225,21 +285,49 @@ def delete_company(
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    # Invalidate all company-related caches
+    # The company's recruiters and reviews may appear in any cached response
     if background_tasks:
-        background_tasks.add_task(invalidate_cache_keys, [
-            "*company*",
-            "*recruiter*",
-            "*review*"
-        ])
+        background_tasks.add_task(invalidate_all_cache)
     
     return {"message": f"Company '{company_name}' has been deleted successfully"}
 
-@app.get("/allReviews/", response_model=List[ReviewResponse])
-@cache(expire=1800)  # Cache for 30 minutes
-def get_all_reviews_endpoint(db: Session = Depends(get_db)):
-    reviews = get_all_reviews(db)
-    return reviews
+@app.get("/allReviews/", response_model=ReviewPage)
+@cached("reviews:all:{limit}:{cursor}", "reviews:all", soft_ttl=1800)  # Fresh for 30 minutes, served stale for up to 1 hour
+async def get_all_reviews_endpoint(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns one page of reviews, oldest first. Pass the returned next_cursor to get the next page.
+    """
+    return await get_all_reviews_async(db, limit=limit, cursor=cursor)
+
+@app.get("/export/reviews.ndjson")
+@limiter.limit("10/hour")
+def export_reviews_endpoint(request: Request):
+    """
+    Streams every review as newline-delimited JSON, for consumers that need the full table.
+    """
+    return StreamingResponse(export_reviews(), media_type="application/x-ndjson")
+
+@app.get("/export/recruiters.ndjson")
+@limiter.limit("10/hour")
+def export_recruiters_endpoint(request: Request):
+    """
+    Streams every recruiter, with its company, as newline-delimited JSON.
+    """
+    return StreamingResponse(export_recruiters(), media_type="application/x-ndjson")
+
+def vote_message(vote: str, action: str) -> str:
+    """Describes a vote action from cast_review_vote, e.g. "Upvote removed"."""
+    if action == "removed":
+        return f"{vote} removed"
+    if action == "unchanged":
+        # A concurrent request had already recorded the same vote
+        return f"{vote} unchanged"
+    # Switching from the opposite vote also counts as adding this one
+    return f"{vote} added"
 
 @app.post("/review/upvote/{review_id}")
 @limiter.limit("30/minute", key_func=get_user_id_for_limiter)
@@ -251,28 +339,19 @@ def upvote(
     background_tasks: BackgroundTasks = None
 ):
     try:
-        original_review = db.query(Review).filter(Review.id == review_id).first()
-        if not original_review:
-            raise HTTPException(status_code=404, detail="Review not found")
-        
-        original_upvotes = original_review.upvotes
-        
         user_id = current_user.get("id")
-        review = upvote_review(db, review_id, user_id)
+        if VOTE_BATCHING_ENABLED:
+            # Buffered; caches are invalidated when the batch is flushed
+            result = vote_buffer.submit(db, review_id, user_id, 1)
+        else:
+            result = upvote_review(db, review_id, user_id)
         
-        # Invalidate specific review cache
-        if background_tasks:
-            background_tasks.add_task(invalidate_cache_keys, [
-                f"*review*{review_id}*",
-                f"*reviews*",
-                f"*allReviews*"
-            ])
+        # Invalidate cached lists containing this review
+        if background_tasks and not VOTE_BATCHING_ENABLED:
+            background_tasks.add_task(invalidate_review_caches, review_ids=[review_id])
         
-        # Determine if an upvote was added or removed
-        if review.upvotes > original_upvotes:
-            return {"message": "Upvote added", "upvotes": review.upvotes}
-        else:
-            return {"message": "Upvote removed", "upvotes": review.upvotes}
+        message = vote_message("Upvote", result["action"])
+        return {"message": message, **result}
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -288,28 +367,19 @@ def downvote(
     background_tasks: BackgroundTasks = None
 ):
     try:
-        original_review = db.query(Review).filter(Review.id == review_id).first()
-        if not original_review:
-            raise HTTPException(status_code=404, detail="Review not found")
-        
-        original_downvotes = original_review.downvotes
-        
         user_id = current_user.get("id")
-        review = downvote_review(db, review_id, user_id)
+        if VOTE_BATCHING_ENABLED:
+            # Buffered; caches are invalidated when the batch is flushed
+            result = vote_buffer.submit(db, review_id, user_id, -1)
+        else:
+            result = downvote_review(db, review_id, user_id)
         
-        # Invalidate specific review cache
-        if background_tasks:
-            background_tasks.add_task(invalidate_cache_keys, [
-                f"*review*{review_id}*",
-                f"*reviews*",
-                f"*allReviews*"
-            ])
+        # Invalidate cached lists containing this review
+        if background_tasks and not VOTE_BATCHING_ENABLED:
+            background_tasks.add_task(invalidate_review_caches, review_ids=[review_id])
         
-        # Determine if a downvote was added or removed
-        if review.downvotes > original_downvotes:
-            return {"message": "Downvote added", "downvotes": review.downvotes}
-        else:
-            return {"message": "Downvote removed", "downvotes": review.downvotes}
+        message = vote_message("Downvote", result["action"])
+        return {"message": message, **result}
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -362,12 +432,7 @@ def edit_review(
     
     # Invalidate related caches
     if background_tasks:
-        background_tasks.add_task(invalidate_cache_keys, [
-            f"*review*{review_id}*",
-            f"*recruiter*{review.recruiter_id}*",
-            f"*reviews*",
-            f"*allReviews*"
-        ])
+        background_tasks.add_task(invalidate_review_caches, recruiter_ids=[review.recruiter_id])
     
     return updated_review
 
@@ -396,12 +461,7 @@ def remove_review(
     
     # Invalidate related caches
     if background_tasks and success:
-        background_tasks.add_task(invalidate_cache_keys, [
-            f"*review*{review_id}*",
-            f"*recruiter*{recruiter_id}*",
-            f"*reviews*", 
-            f"*allReviews*"
-        ])
+        background_tasks.add_task(invalidate_review_caches, recruiter_ids=[recruiter_id])
     
     if success:
         return {"message": "Review deleted successfully"}
@@ -425,16 +485,28 @@ def update_industries(
     
     result = update_all_company_industries(db, force_update=force_update)
     
-    # Invalidate company and industry-related caches
+    # Companies (and their industries) are embedded in most cached responses
     if background_tasks:
-        background_tasks.add_task(invalidate_cache_keys, [
-            "*company*",
-            "*industry*",
-            "*reviews*industry*"
-        ])
+        background_tasks.add_task(invalidate_all_cache)
     
     return result
 
+@app.get("/admin/cache-stats")
+def cache_stats():
+    """
+    Returns this worker's cache hit and miss counters for the in-process L1 tier
+    and the Redis tier, and the Google search cache's counters across all workers.
+    """
+    return {**get_cache_stats(), "google_search": get_search_cache_stats()}
+
+@app.get("/admin/background-stats")
+def background_stats():
+    """
+    Returns this worker's background executor counters: queued, running,
+    completed, failed and rejected tasks.
+    """
+    return background_executor.stats()
+
 @app.post("/admin/update-all-industries")
 def update_all_industries_endpoint(
     db: Session = Depends(get_db)
@@ -447,6 +519,7 @@ def update_all_industries_endpoint(
     return result
 
 @app.get("/industries/", response_model=List[IndustryResponse])
+@cached("industries:all", soft_ttl=86400)  # Fresh for 24 hours, served stale for up to 48 hours
 def get_industries(db: Session = Depends(get_db)):
     """
     Returns a list of all industries with their IDs and names.
@@ -454,12 +527,12 @@ def get_industries(db: Session = Depends(get_db)):
     return get_all_industries(db)
 
 @app.get("/companies/industry/{industry_id}", response_model=List[CompanyResponse])
-def get_companies_by_industry_endpoint(industry_id: int, db: Session = Depends(get_db)):
+async def get_companies_by_industry_endpoint(industry_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve all companies belonging to a specific industry.
     Industry ID is an integer:
     0 = Tech, 1 = Finance, 2 = Consulting, 3 = Healthcare
     """
-    companies = get_companies_by_industry(db, industry_id)
+    companies = await get_companies_by_industry_async(db, industry_id)
     return companies
 
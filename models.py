@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, String, Integer, ForeignKey, Boolean, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -41,6 +41,7 @@ class Company(Base):
     __tablename__ = "companies"
     id = Column(String, primary_key=True, index=True)
     name = Column(String, unique=True, index=True) 
+    # IndustryEnum value, or NULL while the industry hasn't been inferred yet
     industry = Column(Integer, nullable=True)
 
 class Recruiter(Base):
@@ -52,8 +53,20 @@ class Recruiter(Base):
     avg_prof = Column(Integer, default=0)
     avg_help = Column(Integer, default=0)
     avg_final_stage = Column(Integer, default=0)
+    # Running totals the averages are derived from, adjusted on every review write
+    review_count = Column(Integer, default=0)
+    sum_resp = Column(Integer, default=0)
+    sum_prof = Column(Integer, default=0)
+    sum_help = Column(Integer, default=0)
+    sum_final_stage = Column(Integer, default=0)
     verified = Column(Boolean, default=False)
     summary = Column(String, default="")
+    # Which reviews the summary covers, so it can be updated with only the reviews
+    # added or edited since: the latest review text_updated_at and review id it includes,
+    # and how many reviews it was built from
+    summary_watermark = Column(DateTime, nullable=True)
+    summary_max_review_id = Column(Integer, nullable=True)
+    summary_review_count = Column(Integer, default=0)
     company = relationship("Company")
 
 class Review(Base):
@@ -70,6 +83,9 @@ class Review(Base):
     downvotes = Column(Integer, default=0)  
     created_at = Column(DateTime, nullable=True, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=True, onupdate=datetime.utcnow)
+    # When the text last changed; rating-only edits and votes leave it alone, so they
+    # don't make the review look new to incremental summary updates
+    text_updated_at = Column(DateTime, nullable=True)
 
     user = relationship("User")
     recruiter = relationship("Recruiter")
@@ -98,6 +114,8 @@ class Review(Base):
 
 class ReviewVote(Base):
     __tablename__ = "review_votes"
+    # One vote per user per review; vote toggling upserts against this constraint
+    __table_args__ = (UniqueConstraint("review_id", "user_id", name="uq_review_votes_review_user"),)
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     review_id = Column(Integer, ForeignKey("reviews.id"), nullable=False)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
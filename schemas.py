@@ -1,5 +1,5 @@
 from pydantic import BaseModel, field_validator
-from typing import Optional, Union, Any
+from typing import Optional, Union, Any, List
 from datetime import datetime
 from enum import IntEnum
 
@@ -30,6 +30,10 @@ class CompanyResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CompanyPage(BaseModel):
+    items: List[CompanyResponse]
+    next_cursor: Optional[str] = None
+
 class IndustryResponse(BaseModel):
     id: int
     name: str
@@ -58,6 +62,10 @@ class RecruiterResponse(BaseModel):
     verified: bool
     summary: str
 
+class RecruiterPage(BaseModel):
+    items: List[RecruiterResponse]
+    next_cursor: Optional[str] = None
+
 class ReviewCreate(BaseModel):
     user_id: Optional[str] = None
     recruiter_id: str
@@ -89,6 +97,12 @@ class ReviewResponse(BaseModel):
             return int(v.timestamp())
         if isinstance(v, int):
             return v
+        # Cached responses hold timestamps as the ISO-8601 strings they were encoded to
+        if isinstance(v, str):
+            try:
+                return int(datetime.fromisoformat(v).timestamp())
+            except ValueError:
+                pass
         # For any other type, try to convert to int or return None
         try:
             return int(v)
@@ -99,6 +113,10 @@ class ReviewResponse(BaseModel):
         from_attributes = True
         arbitrary_types_allowed = True
 
+class ReviewPage(BaseModel):
+    items: List[ReviewResponse]
+    next_cursor: Optional[str] = None
+
 class ReviewVoteResponse(BaseModel):
     id: int
     review_id: int
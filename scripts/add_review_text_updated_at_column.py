@@ -0,0 +1,26 @@
+"""
+Script to add the text_updated_at column to the reviews table.
+
+Incremental summary updates compare it, instead of updated_at, with a recruiter's
+summary watermark, so rating-only edits don't resend unchanged review texts.
+Existing rows are backfilled from updated_at, which is what their summaries were
+built against. Run it once before deploying:
+
+    python scripts/add_review_text_updated_at_column.py
+"""
+from sqlalchemy import text
+from database import engine
+
+def add_text_updated_at_column():
+    """Add and backfill the text_updated_at column if it doesn't exist yet"""
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE reviews ADD COLUMN IF NOT EXISTS text_updated_at TIMESTAMP NULL"))
+        result = conn.execute(text("UPDATE reviews SET text_updated_at = updated_at WHERE text_updated_at IS NULL"))
+    print(f"Backfilled text_updated_at for {result.rowcount} reviews")
+
+if __name__ == "__main__":
+    try:
+        add_text_updated_at_column()
+        print("✅ Review text_updated_at column is ready.")
+    except Exception as e:
+        print(f"❌ Error adding review text_updated_at column: {str(e)}")
@@ -0,0 +1,80 @@
+"""
+Script to add the (review_id, user_id) unique constraint to review_votes.
+The single-statement vote toggle in crud.cast_review_vote upserts against it.
+
+Duplicate vote rows left behind by earlier races are removed first (keeping the
+oldest row), and the upvote/downvote counters are recounted from review_votes.
+"""
+import os
+import sys
+import psycopg2
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get database connection string from environment
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+def add_review_vote_unique_constraint():
+    """Deduplicate review_votes, add the unique constraint and recount vote totals"""
+    print("Adding unique constraint to review_votes...")
+    
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        cursor = conn.cursor()
+        
+        # Check if the constraint already exists
+        cursor.execute("""
+            SELECT constraint_name 
+            FROM information_schema.table_constraints 
+            WHERE table_name='review_votes' AND constraint_name='uq_review_votes_review_user';
+        """)
+        
+        if cursor.fetchone() is not None:
+            print("uq_review_votes_review_user constraint already exists.")
+        else:
+            # Remove duplicate votes, keeping the first one each user cast
+            cursor.execute("""
+                DELETE FROM review_votes a
+                USING review_votes b
+                WHERE a.review_id = b.review_id
+                  AND a.user_id = b.user_id
+                  AND a.id > b.id;
+            """)
+            print(f"Removed {cursor.rowcount} duplicate vote rows.")
+            
+            cursor.execute("""
+                ALTER TABLE review_votes
+                ADD CONSTRAINT uq_review_votes_review_user UNIQUE (review_id, user_id);
+            """)
+            print("Added uq_review_votes_review_user constraint.")
+        
+        # Recount the aggregated vote totals from the vote rows
+        cursor.execute("""
+            UPDATE reviews SET
+                upvotes = (SELECT COUNT(*) FROM review_votes v WHERE v.review_id = reviews.id AND v.vote = 1),
+                downvotes = (SELECT COUNT(*) FROM review_votes v WHERE v.review_id = reviews.id AND v.vote = -1);
+        """)
+        print(f"Recounted votes for {cursor.rowcount} reviews.")
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return True
+    
+    except Exception as e:
+        print(f"Error adding review_votes unique constraint: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    print("Starting review_votes unique constraint migration...")
+    
+    if not DATABASE_URL:
+        print("Error: DATABASE_URL environment variable not set.")
+        sys.exit(1)
+        
+    if add_review_vote_unique_constraint():
+        print("✅ review_votes unique constraint migration completed successfully.")
+    else:
+        print("❌ Error adding review_votes unique constraint.")
@@ -0,0 +1,31 @@
+"""
+Script to add the summary watermark columns to the recruiters table.
+
+Run it once before deploying incremental summary updates. Existing summaries have
+no watermark, so each recruiter's next summary is rebuilt from all of their
+reviews, and updated incrementally from then on:
+
+    python scripts/add_summary_watermark_columns.py
+"""
+from sqlalchemy import text
+from database import engine
+
+WATERMARK_COLUMNS = {
+    "summary_watermark": "TIMESTAMP NULL",
+    "summary_max_review_id": "INTEGER NULL",
+    "summary_review_count": "INTEGER NOT NULL DEFAULT 0",
+}
+
+def add_watermark_columns():
+    """Add the summary watermark columns if they don't exist yet"""
+    with engine.begin() as conn:
+        for column, definition in WATERMARK_COLUMNS.items():
+            conn.execute(text(f"ALTER TABLE recruiters ADD COLUMN IF NOT EXISTS {column} {definition}"))
+    print(f"Ensured columns exist: {', '.join(WATERMARK_COLUMNS)}")
+
+if __name__ == "__main__":
+    try:
+        add_watermark_columns()
+        print("✅ Summary watermark columns are ready.")
+    except Exception as e:
+        print(f"❌ Error adding summary watermark columns: {str(e)}")
@@ -0,0 +1,38 @@
+"""
+Script to add the running rating total columns to the recruiters table and
+rebuild them (and the averages derived from them) from the reviews table.
+
+Run it once before deploying the incremental rating aggregates, and again at any
+time to reconcile the totals if they are ever suspected to have drifted:
+
+    python scripts/backfill_rating_aggregates.py            # all recruiters
+    python scripts/backfill_rating_aggregates.py <id>       # a single recruiter
+"""
+import sys
+from sqlalchemy import text
+from database import SessionLocal, engine
+from crud import reconcile_rating_aggregates
+
+AGGREGATE_COLUMNS = ["review_count", "sum_resp", "sum_prof", "sum_help", "sum_final_stage"]
+
+def add_aggregate_columns():
+    """Add the running total columns if they don't exist yet"""
+    with engine.begin() as conn:
+        for column in AGGREGATE_COLUMNS:
+            conn.execute(text(
+                f"ALTER TABLE recruiters ADD COLUMN IF NOT EXISTS {column} INTEGER NOT NULL DEFAULT 0"
+            ))
+    print(f"Ensured columns exist: {', '.join(AGGREGATE_COLUMNS)}")
+
+if __name__ == "__main__":
+    recruiter_id = sys.argv[1] if len(sys.argv) > 1 else None
+    try:
+        add_aggregate_columns()
+        db = SessionLocal()
+        updated = reconcile_rating_aggregates(db, recruiter_id)
+        print(f"✅ Rebuilt rating aggregates for {updated} recruiters with reviews.")
+    except Exception as e:
+        print(f"❌ Error rebuilding rating aggregates: {str(e)}")
+    finally:
+        if 'db' in locals():
+            db.close()
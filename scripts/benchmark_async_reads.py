@@ -0,0 +1,92 @@
+"""
+Benchmark comparing the sync and async database read paths under concurrency.
+
+Each simulated request runs a read the way its endpoint does: the sync path opens
+a SessionLocal session on FastAPI's threadpool (run_in_threadpool), the async path
+awaits an AsyncSessionLocal session on the event loop. Caching is bypassed, so
+this measures database throughput only. Point DATABASE_URL at a database with data:
+
+    python scripts/benchmark_async_reads.py                   # 2000 requests, 100 concurrent
+    python scripts/benchmark_async_reads.py <requests> <concurrency>
+"""
+import asyncio
+import random
+import sys
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from database import SessionLocal, AsyncSessionLocal, async_engine
+from models import Recruiter
+from crud import (
+    get_recruiter_by_id, get_reviews, get_all_reviews,
+    get_recruiter_by_id_async, get_reviews_async, get_all_reviews_async
+)
+
+SYNC_READS = [get_recruiter_by_id, get_reviews]
+ASYNC_READS = [get_recruiter_by_id_async, get_reviews_async]
+
+def sync_request(recruiter_id, read):
+    with SessionLocal() as db:
+        if read is None:
+            return get_all_reviews(db)
+        return read(db, recruiter_id)
+
+async def async_request(recruiter_id, read):
+    async with AsyncSessionLocal() as db:
+        if read is None:
+            return await get_all_reviews_async(db)
+        return await read(db, recruiter_id)
+
+async def run(label, make_request, recruiter_ids, reads, total, concurrency):
+    """Runs `total` requests with at most `concurrency` in flight and prints requests per second."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await make_request(random.choice(recruiter_ids), random.choice(reads))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:>6}: {total / elapsed:8.1f} req/s   p50 {p50:7.1f} ms   p99 {p99:7.1f} ms")
+
+async def main(total, concurrency):
+    async with AsyncSessionLocal() as db:
+        recruiter_ids = (await db.scalars(select(Recruiter.id).limit(1000))).all()
+    if not recruiter_ids:
+        print("❌ No recruiters found; run the benchmark against a database with data.")
+        return
+
+    print(f"{total} requests, {concurrency} concurrent, {len(recruiter_ids)} recruiters sampled")
+    # None stands for a page of /allReviews/
+    reads = list(range(len(SYNC_READS))) + [None]
+
+    async def sync_path(recruiter_id, index):
+        read = SYNC_READS[index] if index is not None else None
+        return await run_in_threadpool(sync_request, recruiter_id, read)
+
+    async def async_path(recruiter_id, index):
+        read = ASYNC_READS[index] if index is not None else None
+        return await async_request(recruiter_id, read)
+
+    # Warm up both connection pools before measuring
+    await run("warmup", sync_path, recruiter_ids, reads, concurrency, concurrency)
+    await run("warmup", async_path, recruiter_ids, reads, concurrency, concurrency)
+
+    await run("sync", sync_path, recruiter_ids, reads, total, concurrency)
+    await run("async", async_path, recruiter_ids, reads, total, concurrency)
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    asyncio.run(main(total, concurrency))
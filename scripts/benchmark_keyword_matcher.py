@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of industry keyword scoring: the compiled KeywordMatcher used by
+google.py against the previous approach, a substring check of every keyword in
+every search result. Runs offline on generated search snippets, at a typical keyword
+density and at a keyword-dense one:
+
+    python scripts/benchmark_keyword_matcher.py                 # 10000 snippets
+    python scripts/benchmark_keyword_matcher.py <snippets>
+"""
+import random
+import sys
+import time
+
+from google import INDUSTRY_KEYWORDS, INDUSTRY_MATCHER
+
+FILLER = (
+    "the company is a leading provider of services for customers across the world founded in "
+    "headquartered with offices three apple happy capitalize creditors banker hospitality application"
+).split()
+
+def substring_scores(text: str):
+    """The previous scoring: counts every keyword that occurs anywhere in the lowercased text."""
+    text = text.lower()
+    scores = {industry: 0 for industry in INDUSTRY_KEYWORDS}
+    for industry, keywords in INDUSTRY_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in text:
+                scores[industry] += 1
+    return scores
+
+# Share of words in a snippet that are keywords
+DENSITIES = {"typical": 0.03, "keyword-dense": 0.15}
+
+def make_snippets(count: int, density: float):
+    rng = random.Random(42)
+    keywords = [keyword for keywords in INDUSTRY_KEYWORDS.values() for keyword in keywords]
+    return [
+        " ".join(rng.choice(keywords) if rng.random() < density else rng.choice(FILLER) for _ in range(40))
+        for _ in range(count)
+    ]
+
+def run(label, score, snippets):
+    started = time.perf_counter()
+    for snippet in snippets:
+        score(snippet)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>10}: {elapsed * 1000:8.1f} ms total, {elapsed / len(snippets) * 1e6:6.1f} µs per snippet")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"{count} snippets of 40 words, {sum(map(len, INDUSTRY_KEYWORDS.values()))} keywords")
+    for label, density in DENSITIES.items():
+        snippets = make_snippets(count, density)
+        print(f"\n{label} ({density:.0%} of words are keywords):")
+        run("substring", substring_scores, snippets)
+        run("matcher", INDUSTRY_MATCHER.scores, snippets)
+
+    # Words containing a keyword that the substring scan counted and the matcher doesn't
+    example = "three happy apple creditors at the hospitality capitalize application"
+    print(f"\nFalse hits in {example!r}:")
+    print(f"  substring: {substring_scores(example)}")
+    print(f"  matcher:   {dict(INDUSTRY_MATCHER.scores(example))}")
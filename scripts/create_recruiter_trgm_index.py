@@ -0,0 +1,54 @@
+"""
+Script to enable pg_trgm and create the trigram index used by the
+pg_trgm recruiter search engine (RECRUITER_SEARCH_ENGINE=pg_trgm).
+"""
+import os
+import sys
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get database connection string from environment
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+def create_recruiter_trgm_index():
+    """Create the pg_trgm extension and the GIN index on lower(recruiters.fullName)"""
+    print("Creating recruiter name trigram index...")
+    
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        print("pg_trgm extension is enabled.")
+        
+        cursor.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_recruiters_fullname_trgm
+            ON recruiters USING gin (lower("fullName") gin_trgm_ops);
+        """)
+        print("ix_recruiters_fullname_trgm index is in place.")
+        
+        cursor.close()
+        conn.close()
+        return True
+    
+    except Exception as e:
+        print(f"Error creating recruiter trigram index: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    print("Starting recruiter trigram index creation...")
+    
+    if not DATABASE_URL:
+        print("Error: DATABASE_URL environment variable not set.")
+        sys.exit(1)
+        
+    if create_recruiter_trgm_index():
+        print("✅ Recruiter trigram index creation completed successfully.")
+    else:
+        print("❌ Error creating recruiter trigram index.")
@@ -0,0 +1,319 @@
+"""
+Script to rebuild every recruiter's summary from all of their reviews, e.g. after
+a change to the summary prompt or model.
+
+Recruiters with reviews are streamed in id order through a bounded pipeline: a
+reader loads recruiters and their reviews a page at a time, --concurrency workers
+summarize them with ai_service, and a writer saves the results in batched UPDATEs.
+OpenAI usage is held under a tokens-per-minute budget, estimated from prompt sizes.
+The last recruiter written is checkpointed after every batch, so an interrupted
+run picks up where it stopped:
+
+    python scripts/regenerate_summaries.py                  # resume from the checkpoint, if any
+    python scripts/regenerate_summaries.py --restart        # start from the first recruiter
+    python scripts/regenerate_summaries.py --concurrency 8 --tokens-per-minute 200000 --batch-size 100
+
+Recruiters whose OpenAI summary fails keep their current summary, are listed at the
+end and are saved with the checkpoint. The next run retries them before resuming.
+The checkpoint is removed once a run completes with no failures left.
+"""
+import argparse
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import exists, update
+
+import ai_service
+from crud import summary_columns
+from database import SessionLocal
+from models import Recruiter, Review
+
+CHECKPOINT_FILE = ".regenerate_summaries.checkpoint"
+
+# Recruiters whose summary failed, one id per line, retried first by the next run
+FAILED_FILE = ".regenerate_summaries.failed"
+
+# Recruiters (with their reviews) loaded per read
+READ_PAGE_SIZE = 200
+
+# Rough size of a token in characters, for estimating prompt sizes
+CHARS_PER_TOKEN = 4
+
+# Prompt instructions around the review texts, in tokens
+PROMPT_OVERHEAD_TOKENS = 150
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 10
+
+
+class TokenBucket:
+    """Lets through at most `tokens_per_minute` tokens a minute, with bursts of up to a minute's worth."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.tokens = tokens_per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        tokens = min(tokens, self.capacity)
+        # Waiters are served in order, so large requests aren't starved by small ones
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+def estimate_tokens(reviews) -> int:
+    """Estimates the OpenAI tokens (prompts and completions) needed to summarize `reviews`."""
+    if ai_service.SUMMARY_ENGINE == "extractive":
+        return 0
+    review_tokens = sum(len(ai_service.sanitize_review_text(review.text or "")) for review in reviews) // CHARS_PER_TOKEN
+    if len(reviews) > ai_service.SUMMARY_MAP_REDUCE_THRESHOLD:
+        # One call per chunk, plus the calls combining their notes
+        calls = math.ceil(len(reviews) / ai_service.SUMMARY_CHUNK_SIZE)
+        calls += math.ceil(calls / ai_service.SUMMARY_CHUNK_SIZE)
+        review_tokens += calls * ai_service.SUMMARY_MAX_TOKENS
+    else:
+        calls = 1
+    system_tokens = len(ai_service.SUMMARY_SYSTEM_PROMPT) // CHARS_PER_TOKEN
+    return review_tokens + calls * (system_tokens + PROMPT_OVERHEAD_TOKENS + ai_service.SUMMARY_MAX_TOKENS)
+
+
+def read_checkpoint():
+    if not os.path.exists(CHECKPOINT_FILE):
+        return None
+    with open(CHECKPOINT_FILE) as f:
+        return f.read().strip() or None
+
+
+def write_checkpoint(recruiter_id: str):
+    # Write then rename, so an interrupted write never leaves a truncated checkpoint
+    with open(f"{CHECKPOINT_FILE}.tmp", "w") as f:
+        f.write(recruiter_id)
+    os.replace(f"{CHECKPOINT_FILE}.tmp", CHECKPOINT_FILE)
+
+
+def read_failed():
+    if not os.path.exists(FAILED_FILE):
+        return []
+    with open(FAILED_FILE) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def write_failed(recruiter_ids):
+    if not recruiter_ids:
+        if os.path.exists(FAILED_FILE):
+            os.remove(FAILED_FILE)
+        return
+    with open(f"{FAILED_FILE}.tmp", "w") as f:
+        f.write("".join(f"{recruiter_id}\n" for recruiter_id in recruiter_ids))
+    os.replace(f"{FAILED_FILE}.tmp", FAILED_FILE)
+
+
+def recruiters_with_reviews(db, after_id: str = None):
+    query = db.query(Recruiter.id).filter(exists().where(Review.recruiter_id == Recruiter.id))
+    if after_id is not None:
+        query = query.filter(Recruiter.id > after_id)
+    return query
+
+
+def count_remaining(after_id: str = None) -> int:
+    with SessionLocal() as db:
+        return recruiters_with_reviews(db, after_id).count()
+
+
+def load_reviews(db, recruiter_ids):
+    """Returns (recruiter_id, reviews in id order) pairs for the recruiters that have reviews."""
+    reviews = {recruiter_id: [] for recruiter_id in recruiter_ids}
+    for review in (
+        db.query(Review)
+        .filter(Review.recruiter_id.in_(recruiter_ids))
+        .order_by(Review.recruiter_id, Review.id)
+    ):
+        reviews[review.recruiter_id].append(review)
+    return [(recruiter_id, recruiter_reviews) for recruiter_id, recruiter_reviews in reviews.items() if recruiter_reviews]
+
+
+def read_page(after_id: str = None):
+    """Returns the next READ_PAGE_SIZE recruiters after `after_id` as (recruiter_id, reviews in id order) pairs."""
+    with SessionLocal() as db:
+        recruiter_ids = [
+            row.id for row in recruiters_with_reviews(db, after_id).order_by(Recruiter.id).limit(READ_PAGE_SIZE)
+        ]
+        if not recruiter_ids:
+            return []
+        return load_reviews(db, recruiter_ids)
+
+
+def read_retries(recruiter_ids):
+    """Returns the given recruiters as (recruiter_id, reviews in id order) pairs, skipping any without reviews now."""
+    with SessionLocal() as db:
+        return load_reviews(db, recruiter_ids)
+
+
+def write_batch(rows):
+    """Saves summaries for several recruiters with one bulk UPDATE."""
+    with SessionLocal() as db:
+        db.execute(update(Recruiter), rows)
+        db.commit()
+
+
+async def regenerate(concurrency: int, tokens_per_minute: int, batch_size: int, after_id: str = None,
+                     retry_ids=()):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency + 2)
+    bucket = TokenBucket(tokens_per_minute)
+    # Bounded, so the reader stays only a little ahead of the workers
+    work = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue()
+
+    total = await loop.run_in_executor(executor, count_remaining, after_id) + len(retry_ids)
+    print(f"Regenerating summaries for {total} recruiters"
+          + (f" ({len(retry_ids)} that failed last time)" if retry_ids else "")
+          + (f" after checkpoint {after_id}" if after_id else "")
+          + f" ({ai_service.SUMMARY_ENGINE} engine, {concurrency} workers, {tokens_per_minute} tokens/min)")
+
+    async def reader():
+        position = 0
+        # Recruiters that failed last time come first; they are behind the checkpoint
+        for start in range(0, len(retry_ids), READ_PAGE_SIZE):
+            page = await loop.run_in_executor(executor, read_retries, retry_ids[start:start + READ_PAGE_SIZE])
+            for recruiter_id, reviews in page:
+                await work.put((position, recruiter_id, reviews, True))
+                position += 1
+        last_id = after_id
+        while True:
+            page = await loop.run_in_executor(executor, read_page, last_id)
+            if not page:
+                break
+            for recruiter_id, reviews in page:
+                await work.put((position, recruiter_id, reviews, False))
+                position += 1
+            last_id = page[-1][0]
+        for _ in range(concurrency):
+            await work.put(None)
+
+    async def worker():
+        while (item := await work.get()) is not None:
+            position, recruiter_id, reviews, retry = item
+            tokens = estimate_tokens(reviews)
+            await bucket.acquire(tokens)
+            try:
+                summary, revisable = await loop.run_in_executor(executor, ai_service.summarize_reviews, reviews)
+                # With the OpenAI engine, anything not written by the model is a fallback
+                if not revisable and ai_service.SUMMARY_ENGINE != "extractive":
+                    values = None
+                else:
+                    values = summary_columns(summary, reviews, revisable)
+            except Exception as e:
+                print(f"❌ Error summarizing recruiter {recruiter_id}: {str(e)}")
+                values = None
+            await results.put((position, recruiter_id, values, tokens, retry))
+        await results.put(None)
+
+    async def writer():
+        started = time.monotonic()
+        last_report = started
+        finished_workers = 0
+        # Results arrive out of order; they are written in order, so the checkpoint
+        # only ever covers recruiters whose results have been saved
+        arrived = {}
+        next_position = 0
+        batch = []
+        last_id = None
+        processed = written = tokens_used = 0
+        failed = []
+        # Retries not yet written, kept in the failed file until they are
+        pending_retries = dict.fromkeys(retry_ids)
+
+        async def flush():
+            nonlocal batch, written
+            if batch:
+                await loop.run_in_executor(executor, write_batch, batch)
+                written += len(batch)
+                batch = []
+            write_failed(failed + list(pending_retries))
+            if last_id is not None:
+                write_checkpoint(last_id)
+
+        while finished_workers < concurrency:
+            item = await results.get()
+            if item is None:
+                finished_workers += 1
+                continue
+            arrived[item[0]] = item[1:]
+            while next_position in arrived:
+                recruiter_id, values, tokens, retry = arrived.pop(next_position)
+                next_position += 1
+                processed += 1
+                tokens_used += tokens
+                if retry:
+                    pending_retries.pop(recruiter_id, None)
+                else:
+                    last_id = recruiter_id
+                if values is None:
+                    failed.append(recruiter_id)
+                else:
+                    batch.append({"id": recruiter_id, **values})
+                if len(batch) >= batch_size:
+                    await flush()
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                elapsed = now - started
+                rate = processed / elapsed
+                eta = (total - processed) / rate if rate else 0
+                print(f"{processed}/{total} recruiters ({written} written, {len(failed)} failed), "
+                      f"{rate:.1f}/s, ~{tokens_used / elapsed * 60:.0f} tokens/min, ETA {eta / 60:.1f} min")
+
+        # Retries skipped by the reader no longer have reviews, so there is nothing to summarize
+        pending_retries.clear()
+        await flush()
+        elapsed = time.monotonic() - started
+        print(f"✅ Regenerated {written} summaries in {elapsed:.1f}s "
+              f"({processed / elapsed if elapsed else 0:.1f} recruiters/s, ~{tokens_used} tokens)")
+        if failed:
+            print(f"❌ {len(failed)} recruiters kept their current summary because summarizing failed:")
+            for recruiter_id in failed:
+                print(f"  {recruiter_id}")
+            print(f"Rerun to retry them; they are saved in {FAILED_FILE}")
+
+    try:
+        await asyncio.gather(reader(), writer(), *[worker() for _ in range(concurrency)])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild all recruiter summaries from their reviews.")
+    parser.add_argument("--concurrency", type=int, default=ai_service.OPENAI_MAX_CONCURRENCY,
+                        help="recruiters summarized at once (default: OPENAI_MAX_CONCURRENCY)")
+    parser.add_argument("--tokens-per-minute", type=int, default=90000,
+                        help="estimated OpenAI token budget per minute (default: 90000)")
+    parser.add_argument("--batch-size", type=int, default=50,
+                        help="summaries saved per UPDATE and checkpoint (default: 50)")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the checkpoint and failed recruiters and start from the first recruiter")
+    args = parser.parse_args()
+
+    after_id = None if args.restart else read_checkpoint()
+    retry_ids = [] if args.restart else read_failed()
+    try:
+        asyncio.run(regenerate(args.concurrency, args.tokens_per_minute, args.batch_size, after_id, retry_ids))
+        # Finished, so the next run starts from the beginning again. With failures left,
+        # the checkpoint stays so the next run only retries them.
+        if not os.path.exists(FAILED_FILE) and os.path.exists(CHECKPOINT_FILE):
+            os.remove(CHECKPOINT_FILE)
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun to resume from the checkpoint in {CHECKPOINT_FILE}")
@@ -57,7 +57,11 @@ def update_company_industries(db: Session, force_update=True):
             company.industry = industry_map[current_industry]
         else:
             # Use Google Search to infer the industry
-            inferred_industry = infer_company_industry(company.name)
+            try:
+                inferred_industry = infer_company_industry(company.name)
+            except Exception as e:
+                print(f"❌ Skipping {company.name}, search failed: {str(e)}")
+                continue
             
             # Ensure it's one of our valid industries
             if inferred_industry in valid_industries:
@@ -101,7 +101,11 @@ def update_company_industries():
                 new_industry = industry_map[current_industry]
             else:
                 # Infer industry from Google search
-                new_industry = infer_company_industry(company_name)
+                try:
+                    new_industry = infer_company_industry(company_name)
+                except Exception as e:
+                    print(f"❌ Skipping {company_name}, search failed: {str(e)}")
+                    continue
                 # Make sure it's one of our valid categories
                 if new_industry not in valid_industries:
                     # Default to Tech if not in our list
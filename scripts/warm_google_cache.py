@@ -0,0 +1,66 @@
+"""
+Script to fill the Google search cache ahead of time, so industry inference and
+recruiter verification are served from Redis instead of paid Custom Search calls.
+
+Queries already in the cache are skipped; the rest are fetched a few at a time:
+
+    python scripts/warm_google_cache.py                 # company industry lookups
+    python scripts/warm_google_cache.py recruiters      # recruiter verification lookups too
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from database import SessionLocal
+from models import Company, Recruiter
+from google import (
+    fetch_search, results_to_cache, cache_search, is_cached_search, industry_query, recruiter_query,
+    get_search_cache_stats,
+)
+
+# Concurrent Custom Search requests
+WARM_CONCURRENCY = 4
+
+def warm_queries(include_recruiters: bool):
+    with SessionLocal() as db:
+        queries = [industry_query(name) for (name,) in db.query(Company.name).filter(Company.name.isnot(None))]
+        if include_recruiters:
+            queries += [
+                recruiter_query(full_name, company_name)
+                for full_name, company_name in db.query(Recruiter.fullName, Company.name).join(Recruiter.company)
+            ]
+    return list(dict.fromkeys(queries))
+
+def warm(query: str) -> bool:
+    """
+    Fetches a query's results into the cache. Returns False on an API or network error.
+    Goes around google_search so warming isn't counted as cache misses in the stats.
+    """
+    try:
+        data = fetch_search(query)
+        if "error" in data:
+            print(f"❌ {query}: {data['error'].get('message', data['error'])}")
+            return False
+        cache_search(query, results_to_cache(data))
+        return True
+    except Exception as e:
+        print(f"❌ {query}: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    include_recruiters = len(sys.argv) > 1 and sys.argv[1].lower() == "recruiters"
+    try:
+        queries = warm_queries(include_recruiters)
+        missing = [query for query in queries if not is_cached_search(query)]
+        print(f"{len(queries)} queries, {len(queries) - len(missing)} already cached, fetching {len(missing)}")
+
+        fetched = failed = 0
+        with ThreadPoolExecutor(max_workers=WARM_CONCURRENCY) as executor:
+            for ok in executor.map(warm, missing):
+                fetched += ok
+                failed += not ok
+                if (fetched + failed) % 100 == 0:
+                    print(f"{fetched + failed}/{len(missing)} fetched")
+
+        print(f"✅ Cached {fetched} queries ({failed} failed). Cache stats: {get_search_cache_stats()}")
+    except Exception as e:
+        print(f"❌ Error warming the search cache: {str(e)}")
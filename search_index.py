@@ -0,0 +1,263 @@
+"""
+In-process trigram index over recruiter names.
+
+find_recruiters uses this to narrow the fuzzy-search candidates to a small set
+before running the fuzzywuzzy scorers, instead of scoring every recruiter row.
+"""
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from math import ceil
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Company, Recruiter
+
+# Rebuild the index from the database after this many seconds so that recruiters
+# created by other worker processes become searchable
+REFRESH_SECONDS = int(os.getenv("RECRUITER_INDEX_REFRESH_SECONDS", 300))
+
+# Maximum number of candidates handed to the fuzzy scorers
+MAX_CANDIDATES = 200
+
+# Upper bound on postings scanned per query, so queries made only of very common
+# trigrams stay fast on large tables
+MAX_POSTINGS_SCANNED = 20000
+
+# Fraction of the query's trigrams a name must share to be considered a candidate
+MIN_TRIGRAM_OVERLAP = 0.3
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a name and collapse its whitespace."""
+    return " ".join((name or "").lower().split())
+
+
+def trigrams(text: str) -> set:
+    """
+    Returns the set of character trigrams for text.
+    Each word is padded the same way pg_trgm does it ("  word ") so that short
+    names and word prefixes still produce trigrams.
+    """
+    grams = set()
+    for word in normalize_name(text).split(" "):
+        if not word:
+            continue
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class RecruiterNameIndex:
+    """
+    Inverted index from name trigrams to recruiters.
+    Postings are compact arrays of document numbers; a document number maps back
+    to the recruiter id, its normalized name and its company. Each company also
+    lists its documents, so a search for a company can check all of its recruiters.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._ids = []
+        self._names = []
+        self._docs_by_id = {}
+        self._company_docs = {}
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, recruiter_id: str, full_name: str, company_name: str = None):
+        """Adds a recruiter to the index. Adding the same recruiter twice is a no-op."""
+        with self._lock:
+            if recruiter_id in self._docs_by_id:
+                return
+            doc = len(self._ids)
+            name = normalize_name(full_name)
+            self._ids.append(recruiter_id)
+            self._names.append(name)
+            self._docs_by_id[recruiter_id] = doc
+            for gram in trigrams(name):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array("I")
+                postings.append(doc)
+            if company_name:
+                company_docs = self._company_docs.get(company_name.lower())
+                if company_docs is None:
+                    company_docs = self._company_docs[company_name.lower()] = array("I")
+                company_docs.append(doc)
+
+    def _common_trigram_docs(self, grams):
+        """
+        Docs to score when even the rarest query trigram is too common to scan in full.
+        The names containing the rarest trigrams are intersected (in C, as sets) one
+        trigram at a time. Once fewer than MAX_CANDIDATES names contain them all, those
+        names are returned first; the larger set before that is sampled evenly across
+        the whole index, rather than cut off at the oldest recruiters.
+        """
+        docs = set(self._postings.get(grams[0], ()))
+        best = set()
+        for gram in grams[1:]:
+            narrowed = docs.intersection(self._postings.get(gram, ()))
+            if len(narrowed) < MAX_CANDIDATES:
+                best = narrowed
+                break
+            docs = narrowed
+        # Sets of ints iterate in roughly numeric order, so a stride spans the whole index
+        return list(best) + list(docs)[::ceil(len(docs) / MAX_POSTINGS_SCANNED)]
+
+    def candidates(self, query: str, company: str = None, limit: int = MAX_CANDIDATES):
+        """
+        Returns up to `limit` recruiter ids whose names share the most trigrams
+        with the query, best first. With `company`, matching recruiters at that
+        company are considered however many other names match, and come first.
+        """
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        with self._lock:
+            # A name sharing at least `required` of the n query trigrams must contain
+            # one of the (n - required + 1) rarest ones, so only those postings are scanned
+            required = max(1, ceil(len(query_grams) * MIN_TRIGRAM_OVERLAP))
+            rarest = sorted(query_grams, key=lambda g: len(self._postings.get(g, ())))
+            rarest = rarest[:len(query_grams) - required + 1]
+            hits = Counter()
+            scanned = 0
+            for gram in rarest:
+                postings = self._postings.get(gram, ())
+                if scanned + len(postings) > MAX_POSTINGS_SCANNED:
+                    if scanned:
+                        break
+                    postings = self._common_trigram_docs(rarest)
+                hits.update(postings)
+                scanned += len(postings)
+
+            # Rank by hits on the rare trigrams, then confirm the full overlap for the best few
+            docs = [doc for doc, _ in hits.most_common(limit * 2)]
+            company_docs = set()
+            if company:
+                # Every matching recruiter at the company is checked, so one of them is
+                # never crowded out by more similar names at other companies
+                company_docs = hits.keys() & set(self._company_docs.get(company.lower(), ()))
+                docs += company_docs.difference(docs)
+
+            scored = []
+            for doc in docs:
+                overlap = len(query_grams & trigrams(self._names[doc]))
+                if overlap >= required:
+                    scored.append((doc in company_docs, overlap, doc))
+
+            scored.sort(key=lambda x: x[:2], reverse=True)
+            return [self._ids[doc] for _, _, doc in scored[:limit]]
+
+
+# Shared index for this process, swapped out wholesale on every rebuild
+recruiter_index = RecruiterNameIndex()
+
+_build_lock = threading.Lock()
+_initial_build_lock = threading.Lock()
+_rebuilding = False
+_pending_adds = []
+
+
+def _load_index(db: Session) -> RecruiterNameIndex:
+    """Builds a fresh index from every recruiter in the database."""
+    index = RecruiterNameIndex()
+    rows = db.query(Recruiter.id, Recruiter.fullName, Company.name).outerjoin(
+        Company, Recruiter.company_id == Company.id
+    ).yield_per(10000)
+    for recruiter_id, full_name, company_name in rows:
+        index.add(recruiter_id, full_name, company_name)
+    index.built_at = time.monotonic()
+    return index
+
+
+def _swap_index(index: RecruiterNameIndex):
+    """Installs a rebuilt index, replaying recruiters added while it was being built."""
+    global recruiter_index, _rebuilding
+    with _build_lock:
+        for recruiter_id, full_name, company_name in _pending_adds:
+            index.add(recruiter_id, full_name, company_name)
+        _pending_adds.clear()
+        recruiter_index = index
+        _rebuilding = False
+
+
+def _rebuild(db: Session):
+    global _rebuilding
+    try:
+        index = _load_index(db)
+    except Exception:
+        with _build_lock:
+            _pending_adds.clear()
+            _rebuilding = False
+        raise
+    _swap_index(index)
+
+
+def _refresh_in_background():
+    try:
+        with SessionLocal() as bg_db:
+            _rebuild(bg_db)
+    except Exception as e:
+        print(f"Recruiter index refresh failed: {str(e)}")
+
+
+def get_recruiter_index(db: Session) -> RecruiterNameIndex:
+    """
+    Returns the process-wide recruiter index, building it on first use.
+    Once the index is older than REFRESH_SECONDS it keeps serving searches while
+    a replacement is built on a background thread.
+    """
+    global _rebuilding
+    if recruiter_index.built_at is None:
+        with _initial_build_lock:
+            if recruiter_index.built_at is None:
+                with _build_lock:
+                    _rebuilding = True
+                _rebuild(db)
+        return recruiter_index
+
+    if time.monotonic() - recruiter_index.built_at > REFRESH_SECONDS:
+        with _build_lock:
+            if _rebuilding:
+                return recruiter_index
+            _rebuilding = True
+        thread = threading.Thread(target=_refresh_in_background)
+        thread.daemon = True
+        thread.start()
+
+    return recruiter_index
+
+
+def warm_recruiter_index():
+    """
+    Builds the index on a background thread, so the first search in this worker
+    doesn't pay for loading every recruiter name.
+    """
+    def warm():
+        try:
+            with SessionLocal() as db:
+                get_recruiter_index(db)
+        except Exception as e:
+            print(f"Recruiter index warm-up failed: {str(e)}")
+
+    thread = threading.Thread(target=warm)
+    thread.daemon = True
+    thread.start()
+
+
+def index_recruiter(recruiter_id: str, full_name: str, company_name: str = None):
+    """Adds a newly created recruiter to the live index (and to any rebuild in progress)."""
+    with _build_lock:
+        if _rebuilding:
+            _pending_adds.append((recruiter_id, full_name, company_name))
+    if recruiter_index.built_at is not None:
+        recruiter_index.add(recruiter_id, full_name, company_name)
@@ -0,0 +1,82 @@
+"""
+Tests run against a throwaway SQLite database and an in-memory fake Redis, so
+they need neither Postgres nor a Redis server. The environment is set before
+any app module is imported, since database.py and ai_service.py read it at import.
+"""
+import os
+import sys
+import tempfile
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeredis
+import pytest
+from sqlalchemy import event
+
+import cache
+import jobs
+import models  # noqa: F401  registers the tables on Base
+from database import Base, SessionLocal, async_engine, engine
+
+Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        # Empty every table so each test starts from a clean database
+        with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Points the shared sync Redis client at a fresh in-memory fake."""
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(jobs, "_redis", client)
+    return client
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def client(monkeypatch, redis_server):
+    """A TestClient for the app, with its response cache in a fake Redis."""
+    monkeypatch.setattr(cache.aioredis, "from_url", lambda *args, **kwargs: fakeredis.FakeAsyncRedis(server=redis_server))
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def count_statements():
+    """Returns a function running `run()` and returning (its result, the SQL statements it executed on either engine)."""
+    def count(run):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engines = [engine, async_engine.sync_engine]
+        for target in engines:
+            event.listen(target, "before_cursor_execute", before_cursor_execute)
+        try:
+            result = run()
+        finally:
+            for target in engines:
+                event.remove(target, "before_cursor_execute", before_cursor_execute)
+        return result, len(statements)
+
+    return count
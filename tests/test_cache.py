@@ -0,0 +1,114 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi_cache.backends.redis import RedisBackend
+
+import cache
+from cache import TwoTierBackend, cached
+
+
+@pytest.fixture
+def backend(monkeypatch, redis_server):
+    """Installs a two-tier cache backed by a fake Redis, as setup_cache does."""
+    client = fakeredis.FakeAsyncRedis(server=redis_server)
+    backend = TwoTierBackend(RedisBackend(client))
+    monkeypatch.setattr(cache, "redis_client", client)
+    monkeypatch.setattr(cache, "cache_backend", backend)
+    return backend
+
+
+def test_family_endpoints_are_served_uncached_when_redis_is_down(backend, redis_server):
+    calls = []
+
+    @cached("recruiters:search:{name}", "recruiters:search")
+    async def search(name):
+        calls.append(name)
+        return [name]
+
+    redis_server.connected = False
+
+    async def run():
+        return [await search(name="jane"), await search(name="jane")]
+
+    assert asyncio.run(run()) == [["jane"], ["jane"]]
+    assert calls == ["jane", "jane"]
+
+
+def test_l1_keeps_at_most_max_entries_least_recently_used_first(redis_server, monkeypatch):
+    backend = TwoTierBackend(RedisBackend(fakeredis.FakeAsyncRedis(server=redis_server)), max_entries=2)
+
+    async def run():
+        await backend.set("a", b"1", 60)
+        await backend.set("b", b"2", 60)
+        # Reading "a" makes "b" the least recently used entry
+        await backend.get("a")
+        await backend.set("c", b"3", 60)
+        assert backend.local_size() == 2
+        assert backend.stats["l1"] == {"hits": 1, "misses": 0}
+
+        # "b" was evicted locally but is still in Redis
+        assert await backend.get("b") == b"2"
+        assert backend.stats["l1"] == {"hits": 1, "misses": 1}
+        assert backend.local_size() == 2
+
+    asyncio.run(run())
+
+
+async def wait_for(condition, timeout=2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def start_listener():
+    """Starts listen_for_invalidations and waits until it is subscribed."""
+    listener = asyncio.create_task(cache.listen_for_invalidations())
+    subscribers = 0
+    while not subscribers:
+        await asyncio.sleep(0.01)
+        [(_, subscribers)] = await cache.redis_client.pubsub_numsub(cache.INVALIDATION_CHANNEL)
+    return listener
+
+
+def test_invalidations_from_other_workers_drop_l1_entries(backend, redis_server):
+    other_worker = fakeredis.FakeAsyncRedis(server=redis_server)
+
+    async def run():
+        listener = await start_listener()
+        try:
+            await backend.set(f"{cache.CACHE_PREFIX}reviews:recruiter:1", b"old", 60)
+            await backend.set(f"{cache.CACHE_PREFIX}reviews:recruiter:2", b"kept", 60)
+
+            await other_worker.publish(cache.INVALIDATION_CHANNEL, '{"keys": ["reviews:recruiter:1"]}')
+            await wait_for(lambda: backend.local_size() == 1)
+            assert backend._get_local(f"{cache.CACHE_PREFIX}reviews:recruiter:2") is not None
+        finally:
+            listener.cancel()
+
+    asyncio.run(run())
+
+
+def test_recompute_keeps_its_own_l1_entry(backend):
+    calls = []
+
+    @cached("reviews:recruiter:{recruiter_id}")
+    async def reviews(recruiter_id):
+        calls.append(recruiter_id)
+        return [recruiter_id]
+
+    async def run():
+        listener = await start_listener()
+        try:
+            assert await reviews(recruiter_id="1") == ["1"]
+            # Give the listener time to receive this process's own invalidation
+            await asyncio.sleep(0.1)
+            assert backend.local_size() == 1
+            assert await reviews(recruiter_id="1") == ["1"]
+        finally:
+            listener.cancel()
+
+    asyncio.run(run())
+    assert calls == ["1"]
+    assert backend.stats["l1"]["hits"] == 1
@@ -0,0 +1,129 @@
+"""
+A write must evict exactly the cached responses it affects. Every endpoint is
+cached first; after the write, a response served without touching the database
+was a cache hit.
+"""
+import uuid
+
+import pytest
+
+import crud
+import main
+from auth import create_jwt_token
+from models import Company, Recruiter, Review, User
+
+# Cached responses that show recruiter A's reviews, ratings or summary
+AFFECTED_BY_REVIEW = [
+    "/recruiter/{a}",
+    "/reviews/?recruiter_id={a}",
+    "/reviews/company/Acme",
+    "/reviews/industry/0",
+    "/recruiters/",
+    "/allReviews/",
+]
+
+# Cached responses that don't
+UNAFFECTED = [
+    "/recruiter/{b}",
+    "/reviews/?recruiter_id={b}",
+    "/reviews/company/Globex",
+    "/reviews/industry/1",
+    "/companies/",
+]
+
+
+@pytest.fixture
+def recruiters(client, db, monkeypatch):
+    """
+    Recruiter A (Acme, Tech) and recruiter B (Globex, Finance), each reviewed by the signed-in user. A has a second
+    review so its listings stay non-empty when one is deleted.
+    """
+    # Summaries are regenerated by a background job; not under test here
+    monkeypatch.setattr(crud, "schedule_summary", lambda recruiter_id: None)
+    user = User(id=str(uuid.uuid4()), fullName="Reviewer")
+    earlier = User(id=str(uuid.uuid4()), fullName="Earlier Reviewer")
+    acme = Company(id=str(uuid.uuid4()), name="Acme", industry=0)
+    globex = Company(id=str(uuid.uuid4()), name="Globex", industry=1)
+    a = Recruiter(id=str(uuid.uuid4()), fullName="Alice Adams", company_id=acme.id)
+    b = Recruiter(id=str(uuid.uuid4()), fullName="Bob Brown", company_id=globex.id)
+    db.add_all([user, earlier, acme, globex, a, b])
+    db.flush()
+    reviews = {}
+    for reviewer, recruiter in ((earlier, a), (user, a), (user, b)):
+        review = Review(user_id=reviewer.id, recruiter_id=recruiter.id, professionalism=4, responsiveness=4,
+                        helpfulness=4, text="Clear and quick to reply", final_stage=2)
+        db.add(review)
+        db.flush()
+        reviews[recruiter.id] = review.id
+    db.commit()
+    client.cookies.set("access_token", create_jwt_token(user.id, ""))
+    return {"a": a.id, "b": b.id, "review_a": reviews[a.id], "user": user.id}
+
+
+def warm(client, urls):
+    for url in urls:
+        assert client.get(url).status_code == 200
+
+
+def cache_hits(client, count_statements, urls):
+    """Returns the urls that were served from the cache, i.e. without any SQL."""
+    hits = []
+    for url in urls:
+        response, statements = count_statements(lambda: client.get(url))
+        assert response.status_code == 200
+        if statements == 0:
+            hits.append(url)
+    return hits
+
+
+def check_review_write_invalidation(client, count_statements, recruiters, write):
+    affected = [url.format(**recruiters) for url in AFFECTED_BY_REVIEW]
+    unaffected = [url.format(**recruiters) for url in UNAFFECTED]
+    warm(client, affected + unaffected)
+    assert cache_hits(client, count_statements, affected + unaffected) == affected + unaffected
+
+    response = write()
+    assert response.status_code == 200, response.text
+
+    assert cache_hits(client, count_statements, affected + unaffected) == unaffected
+
+
+def test_posting_a_review_evicts_only_that_recruiters_entries(client, db, count_statements, recruiters):
+    # A second reviewer, since each user reviews a recruiter once
+    other = User(id=str(uuid.uuid4()), fullName="Second Reviewer")
+    db.add(other)
+    db.commit()
+    client.cookies.set("access_token", create_jwt_token(other.id, ""))
+
+    check_review_write_invalidation(client, count_statements, recruiters, lambda: client.post("/review/", json={
+        "recruiter_id": recruiters["a"], "professionalism": 5, "responsiveness": 5, "helpfulness": 5,
+        "text": "Kept me updated at every stage", "final_stage": 3,
+    }))
+
+
+def test_editing_a_review_evicts_only_that_recruiters_entries(client, count_statements, recruiters):
+    check_review_write_invalidation(client, count_statements, recruiters, lambda: client.put(
+        f"/review/{recruiters['review_a']}/", json={"professionalism": 1}
+    ))
+
+
+def test_deleting_a_review_evicts_only_that_recruiters_entries(client, count_statements, recruiters):
+    check_review_write_invalidation(client, count_statements, recruiters, lambda: client.delete(
+        f"/review/{recruiters['review_a']}/"
+    ))
+
+
+def test_voting_evicts_only_the_review_listings(client, count_statements, recruiters, monkeypatch):
+    # The vote statement is Postgres-only; the invalidation that follows it is what's under test
+    monkeypatch.setattr(main, "upvote_review", lambda db, review_id, user_id: {"action": "added", "upvotes": 1, "downvotes": 0})
+    # Votes change review counts, not recruiter ratings, so profiles and recruiter lists stay cached
+    affected = [url.format(**recruiters) for url in [
+        "/reviews/?recruiter_id={a}", "/reviews/company/Acme", "/reviews/industry/0", "/allReviews/",
+    ]]
+    unaffected = [url.format(**recruiters) for url in UNAFFECTED + ["/recruiter/{a}", "/recruiters/"]]
+    warm(client, affected + unaffected)
+
+    response = client.post(f"/review/upvote/{recruiters['review_a']}")
+    assert response.status_code == 200, response.text
+
+    assert cache_hits(client, count_statements, affected + unaffected) == unaffected
@@ -0,0 +1,79 @@
+"""
+Each read endpoint must run the same number of SQL statements however many rows
+it returns, i.e. no query per row. Statements are counted on both engines, on a
+cache miss (the cache is cleared before every request).
+"""
+import time
+import uuid
+
+import fakeredis
+import pytest
+
+import cache
+import search_index
+from auth import create_jwt_token
+from models import Company, Recruiter, Review, User
+
+ENDPOINTS = [
+    "/recruiters/",
+    "/companies/",
+    "/allReviews/",
+    "/recruiter/?fullName=Recruiter&company=Acme",
+    "/recruiter/{recruiter_id}",
+    "/recruiters/featured/",
+    "/editors-picks/",
+    "/reviews/?recruiter_id={recruiter_id}",
+    "/reviews/company/Acme",
+    "/reviews/industry/0",
+    "/companies/industry/0",
+    "/profile/reviews/",
+]
+
+
+def add_reviewed_recruiters(db, editor, count):
+    """Adds recruiters, every other one at Acme, each reviewed by the editor."""
+    acme = db.query(Company).filter(Company.name == "Acme").first()
+    if acme is None:
+        acme = Company(id=str(uuid.uuid4()), name="Acme", industry=0)
+        db.add(acme)
+    for i in range(count):
+        company = acme
+        if i % 2:
+            company = Company(id=str(uuid.uuid4()), name=f"Company {uuid.uuid4()}", industry=0)
+            db.add(company)
+        recruiter = Recruiter(id=str(uuid.uuid4()), fullName=f"Recruiter {uuid.uuid4().hex[:6]}", company_id=company.id)
+        db.add(recruiter)
+        db.flush()
+        db.add(Review(user_id=editor.id, recruiter_id=recruiter.id, professionalism=4, responsiveness=4,
+                      helpfulness=4, text="Clear and quick to reply", final_stage=2))
+    db.commit()
+    # Make the new recruiters searchable, as a periodic rebuild would
+    search_index._swap_index(search_index._load_index(db))
+
+
+def count_cache_miss(client, redis_server, count_statements, url):
+    """Returns how many SQL statements a request to `url` runs, starting from an empty cache."""
+    fakeredis.FakeRedis(server=redis_server).flushall()
+    cache.cache_backend.evict_local()
+    response, statements = count_statements(lambda: client.get(url))
+    assert response.status_code == 200, response.text
+    assert response.json()
+    return statements
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_endpoint_query_count_is_constant(client, redis_server, db, count_statements, endpoint):
+    # Let the startup index build finish, so it isn't counted
+    while search_index.recruiter_index.built_at is None:
+        time.sleep(0.01)
+    editor = User(id=str(uuid.uuid4()), fullName="Aditya Uchil")
+    db.add(editor)
+    add_reviewed_recruiters(db, editor, 4)
+    client.cookies.set("access_token", create_jwt_token(editor.id, ""))
+    url = endpoint.format(recruiter_id=db.query(Recruiter.id).first()[0])
+
+    few = count_cache_miss(client, redis_server, count_statements, url)
+    add_reviewed_recruiters(db, editor, 30)
+    many = count_cache_miss(client, redis_server, count_statements, url)
+
+    assert many == few
@@ -0,0 +1,61 @@
+import asyncio
+
+import httpx
+import pytest
+
+import google
+
+
+def search_with(monkeypatch, responses, queries):
+    """Runs google_search_async for each query against a fake Custom Search API. Returns the results and requests made."""
+    requests = []
+    # Retries are timed by Retry-After, so the test doesn't wait on backoff
+    monkeypatch.setattr(google.random, "uniform", lambda low, high: 0)
+
+    def handler(request):
+        requests.append(request)
+        return responses.pop(0)
+
+    async def run():
+        monkeypatch.setattr(google, "_async_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            return [await google.google_search_async(query) for query in queries]
+        finally:
+            await google.close_async_client()
+
+    return asyncio.run(run()), requests
+
+
+def test_async_search_retries_and_shares_the_search_cache(fake_redis, monkeypatch):
+    item = {"title": "Initech | Software", "link": "https://initech.example", "snippet": "Enterprise software", "rank": 1}
+    responses = [
+        httpx.Response(503, headers={"Retry-After": "1"}, json={"error": {"code": 503}}),
+        httpx.Response(200, json={"items": [item]}),
+    ]
+
+    results, requests = search_with(monkeypatch, responses, ["Initech industry", "initech  INDUSTRY"])
+
+    expected = {"items": [{"title": item["title"], "link": item["link"], "snippet": item["snippet"]}]}
+    assert results == [expected, expected]
+    # One retry, then the repeat query is a cache hit
+    assert len(requests) == 2
+    assert requests[0].url.params["q"] == "Initech industry"
+    # The sync lookup reads the same cache entry
+    monkeypatch.setattr(google, "fetch_search", lambda query: pytest.fail("cached query was fetched"))
+    assert google.google_search("Initech industry") == expected
+    assert google.get_search_cache_stats()["misses"] == 1
+
+
+def test_async_search_errors_are_not_cached(fake_redis, monkeypatch):
+    error = {"error": {"code": 403, "message": "Daily limit exceeded"}}
+    responses = [httpx.Response(403, json=error), httpx.Response(403, json=error)]
+
+    results, requests = search_with(monkeypatch, responses, ["Initech industry", "Initech industry"])
+
+    assert results == [error, error]
+    assert len(requests) == 2
+
+
+def test_async_search_needs_an_open_client(fake_redis):
+    with pytest.raises(RuntimeError):
+        asyncio.run(google.google_search_async("Initech industry"))
@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+
+import google
+from crud import infer_industry
+from google import SearchError
+from models import Company, IndustryEnum
+
+
+def add_company(db):
+    company = Company(id=str(uuid.uuid4()), name="Initech")
+    db.add(company)
+    db.commit()
+    return company.id
+
+
+def company_industry(db, company_id):
+    db.expire_all()
+    return db.query(Company).filter(Company.id == company_id).one().industry
+
+
+def test_failed_search_leaves_company_unclassified(db, fake_redis, monkeypatch):
+    company_id = add_company(db)
+    monkeypatch.setattr(google, "google_search", lambda query: {"error": {"code": 429, "message": "Rate limit exceeded"}})
+
+    with pytest.raises(SearchError):
+        infer_industry(company_id)
+
+    assert company_industry(db, company_id) is None
+
+
+def test_network_error_leaves_company_unclassified(db, fake_redis, monkeypatch):
+    company_id = add_company(db)
+
+    def unreachable(query):
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(google, "google_search", unreachable)
+
+    with pytest.raises(ConnectionError):
+        infer_industry(company_id)
+
+    assert company_industry(db, company_id) is None
+
+
+def test_search_without_results_defaults_to_tech(db, fake_redis, monkeypatch):
+    company_id = add_company(db)
+    monkeypatch.setattr(google, "google_search", lambda query: {"items": []})
+
+    infer_industry(company_id)
+
+    assert company_industry(db, company_id) == IndustryEnum.TECH
+
+
+def test_search_results_decide_the_industry(db, fake_redis, monkeypatch):
+    company_id = add_company(db)
+    monkeypatch.setattr(google, "google_search", lambda query: {"items": [
+        {"title": "Initech | Investment banking", "snippet": "A financial services and banking firm", "link": ""},
+    ]})
+
+    infer_industry(company_id)
+
+    assert company_industry(db, company_id) == IndustryEnum.FINANCE
@@ -0,0 +1,28 @@
+import threading
+
+import pytest
+
+import jobs
+from jobs import job_handler, schedule_coalesced
+
+
+@pytest.fixture
+def rejecting_executor(monkeypatch):
+    """Makes the background executor reject every task, as when its queue is full."""
+    monkeypatch.setattr(jobs, "JOB_QUEUE_BACKEND", "thread")
+    monkeypatch.setattr(jobs.background_executor, "submit", lambda *args, **kwargs: None)
+
+
+@job_handler("test_noop")
+def noop(**args):
+    pass
+
+
+@pytest.mark.parametrize("delay", [0, 0.01])
+def test_rejected_coalesced_job_can_be_scheduled_again(rejecting_executor, delay):
+    key = f"test:rejected:{delay}"
+    schedule_coalesced("test_noop", key, delay)
+    for timer in [thread for thread in threading.enumerate() if isinstance(thread, threading.Timer)]:
+        timer.join()
+
+    assert key not in jobs._local_pending
@@ -0,0 +1,44 @@
+import pytest
+
+from google import INDUSTRY_MATCHER, RECRUITING_MATCHER, keyword_forms
+
+
+def test_keywords_only_match_whole_words():
+    assert INDUSTRY_MATCHER.scores("Apple makes apps") == {"tech": 1}
+    assert INDUSTRY_MATCHER.scores("apple") == {}
+
+
+def test_hr_does_not_match_inside_other_words():
+    assert not RECRUITING_MATCHER.matches("three offices")
+    assert RECRUITING_MATCHER.matches("HR business partner")
+
+
+def test_longest_keyword_wins():
+    assert INDUSTRY_MATCHER.scores("A health tech startup") == {"healthcare": 1}
+    assert INDUSTRY_MATCHER.scores("Health-tech for hospitals and tech firms") == {"healthcare": 2, "tech": 1}
+
+
+@pytest.mark.parametrize("text, industry", [
+    ("Initech Technologies", "tech"),
+    ("Regional banks", "finance"),
+    ("Mortgage financing", "finance"),
+    ("Pharmaceutical companies and hospitals", "healthcare"),
+    ("Management consultants", "consulting"),
+])
+def test_inflected_keywords_count(text, industry):
+    assert INDUSTRY_MATCHER.scores(text)[industry] >= 1
+
+
+def test_forms_of_one_keyword_count_once():
+    assert INDUSTRY_MATCHER.scores("technology and technologies") == {"tech": 1}
+
+
+@pytest.mark.parametrize("keyword, form", [
+    ("technology", "technologies"),
+    ("bank", "banks"),
+    ("business", "businesses"),
+    ("finance", "financing"),
+    ("asset management", "asset managements"),
+])
+def test_keyword_forms(keyword, form):
+    assert form in keyword_forms(keyword)
@@ -0,0 +1,23 @@
+import uuid
+
+import cache
+from models import Company, Recruiter, Review, User
+
+
+def test_reviews_have_timestamps_on_cache_miss_and_hit(client, db):
+    company = Company(id=str(uuid.uuid4()), name="Acme")
+    recruiter = Recruiter(id=str(uuid.uuid4()), fullName="Jane Doe", company_id=company.id)
+    user = User(id=str(uuid.uuid4()), fullName="Reviewer")
+    db.add_all([company, recruiter, user])
+    db.flush()
+    db.add(Review(user_id=user.id, recruiter_id=recruiter.id, professionalism=4, responsiveness=4,
+                  helpfulness=4, text="Helpful and quick to reply", final_stage=2))
+    db.commit()
+
+    miss = client.get("/reviews/", params={"recruiter_id": recruiter.id})
+    hit = client.get("/reviews/", params={"recruiter_id": recruiter.id})
+
+    assert miss.status_code == hit.status_code == 200
+    assert isinstance(miss.json()[0]["created_at"], int)
+    assert hit.json() == miss.json()
+    assert cache.cache_backend.stats["l1"]["hits"] == 1
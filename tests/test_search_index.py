@@ -0,0 +1,23 @@
+from search_index import MAX_CANDIDATES, MAX_POSTINGS_SCANNED, RecruiterNameIndex
+
+
+def test_recruiter_at_the_requested_company_survives_many_similar_names():
+    index = RecruiterNameIndex()
+    for i in range(MAX_CANDIDATES * 2):
+        index.add(f"other-{i}", "John Smith", f"Company {i}")
+    index.add("acme", "Jon Smithe", "Acme")
+
+    assert "acme" not in index.candidates("john smith")
+    candidates = index.candidates("john smith", company="ACME")
+    assert candidates[0] == "acme"
+    assert len(candidates) == MAX_CANDIDATES
+
+
+def test_names_made_of_common_trigrams_are_found_among_the_newest_recruiters():
+    index = RecruiterNameIndex()
+    for i in range(MAX_POSTINGS_SCANNED + 5000):
+        index.add(f"ann-{i}", "Ann")
+        index.add(f"lee-{i}", "Lee")
+    index.add("ann-lee", "Ann Lee")
+
+    assert index.candidates("ann lee")[0] == "ann-lee"
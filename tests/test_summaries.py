@@ -0,0 +1,93 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import crud
+from crud import reviews_since_summary
+from models import Recruiter, Review, User
+from schemas import ReviewUpdate
+
+
+def established_summary():
+    """A recruiter whose model-written summary covers 10 reviews, plus one newer review."""
+    written_at = datetime(2024, 1, 1)
+    reviews = [SimpleNamespace(id=i, created_at=written_at, text_updated_at=None) for i in range(1, 12)]
+    reviews[-1].created_at = written_at + timedelta(days=1)
+    recruiter = SimpleNamespace(summary="Responsive and clear about the process.", summary_watermark=written_at,
+                                summary_max_review_id=10, summary_review_count=10)
+    return recruiter, reviews
+
+
+def test_new_reviews_are_revised_incrementally(monkeypatch):
+    monkeypatch.setattr(crud, "SUMMARY_INCREMENTAL", True)
+    monkeypatch.setattr(crud, "SUMMARY_INCREMENTAL_MIN_REVIEWS", 10)
+    recruiter, reviews = established_summary()
+
+    assert reviews_since_summary(recruiter, reviews) == [reviews[-1]]
+
+
+def test_extractive_engine_always_rebuilds(monkeypatch):
+    monkeypatch.setattr(crud, "SUMMARY_INCREMENTAL", True)
+    monkeypatch.setattr(crud, "SUMMARY_INCREMENTAL_MIN_REVIEWS", 10)
+    monkeypatch.setattr(crud, "SUMMARY_ENGINE", "extractive")
+    recruiter, reviews = established_summary()
+
+    assert reviews_since_summary(recruiter, reviews) is None
+
+
+def summarized_review(db, monkeypatch):
+    """A review covered by its recruiter's established summary, with summary regeneration stubbed out."""
+    monkeypatch.setattr(crud, "SUMMARY_INCREMENTAL", True)
+    monkeypatch.setattr(crud, "SUMMARY_INCREMENTAL_MIN_REVIEWS", 1)
+    monkeypatch.setattr(crud, "schedule_summary", lambda recruiter_id: None)
+    recruiter = Recruiter(id=str(uuid.uuid4()), fullName="Alice Adams")
+    user = User(id=str(uuid.uuid4()), fullName="Reviewer")
+    db.add_all([recruiter, user])
+    db.flush()
+    review = Review(user_id=user.id, recruiter_id=recruiter.id, professionalism=4, responsiveness=4,
+                    helpfulness=4, text="Clear and quick to reply", final_stage=2)
+    db.add(review)
+    db.flush()
+    for column, value in crud.summary_columns("Responsive and clear.", [review], True).items():
+        setattr(recruiter, column, value)
+    db.commit()
+    return recruiter, review
+
+
+def test_rating_only_edit_keeps_summary_current(db, monkeypatch):
+    recruiter, review = summarized_review(db, monkeypatch)
+
+    crud.update_review(db, review.id, ReviewUpdate(professionalism=1))
+
+    db.refresh(recruiter)
+    assert reviews_since_summary(recruiter, [review]) == []
+
+
+def test_text_edit_is_sent_to_the_next_summary(db, monkeypatch):
+    recruiter, review = summarized_review(db, monkeypatch)
+
+    crud.update_review(db, review.id, ReviewUpdate(text="Slow to reply after the final round"))
+
+    db.refresh(recruiter)
+    assert reviews_since_summary(recruiter, [review]) == [review]
+
+
+def test_new_summary_invalidates_cached_profiles(db, fake_redis, monkeypatch):
+    recruiter = Recruiter(id=str(uuid.uuid4()), fullName="Alice Adams", summary="Old summary")
+    user = User(id=str(uuid.uuid4()), fullName="Reviewer")
+    db.add_all([recruiter, user])
+    db.flush()
+    db.add(Review(user_id=user.id, recruiter_id=recruiter.id, professionalism=4, responsiveness=4,
+                  helpfulness=4, text="Clear and quick to reply", final_stage=2))
+    db.commit()
+    monkeypatch.setattr(crud, "summarize_reviews", lambda reviews: ("New summary", True))
+    invalidated = []
+    monkeypatch.setattr(crud, "invalidate_cache_sync", lambda keys=(), families=(): invalidated.append((keys, families)))
+
+    crud.regenerate_summary(recruiter.id)
+
+    db.expire_all()
+    assert db.query(Recruiter).filter(Recruiter.id == recruiter.id).one().summary == "New summary"
+    [(keys, families)] = invalidated
+    assert f"recruiter:{recruiter.id}" in keys and "recruiters:featured" in keys
+    assert {"recruiters:all", "recruiters:search"} <= set(families)
@@ -0,0 +1,37 @@
+import asyncio
+
+from vote_buffer import VoteBuffer
+
+
+def test_flusher_keeps_running_after_a_failed_round(monkeypatch):
+    buffer = VoteBuffer(flush_ms=5)
+    flushes = []
+    invalidated = []
+
+    def flush(user_id=None):
+        flushes.append(user_id)
+        if len(flushes) == 1:
+            raise RuntimeError("database unavailable")
+        with buffer._lock:
+            buffer._changed_reviews.add(len(flushes))
+        return [len(flushes)]
+
+    async def on_flush(review_ids):
+        invalidated.append(review_ids)
+        if len(invalidated) == 1:
+            raise ConnectionError("Redis unavailable")
+
+    monkeypatch.setattr(buffer, "flush", flush)
+
+    async def run():
+        task = asyncio.create_task(buffer.run(on_flush))
+        while len(invalidated) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+    # The failed invalidation of review 2 is retried along with the next flush's review
+    assert invalidated[0] == [2]
+    assert invalidated[1] == [2, 3]
+    assert invalidated[2] == [4]
@@ -0,0 +1,31 @@
+import uuid
+
+import pytest
+
+import main
+from auth import create_jwt_token
+from models import User
+
+
+@pytest.mark.parametrize("path, vote_function, vote", [
+    ("/review/upvote/1", "upvote_review", "Upvote"),
+    ("/review/downvote/1", "downvote_review", "Downvote"),
+])
+@pytest.mark.parametrize("action, message", [
+    ("added", "added"),
+    ("changed", "added"),
+    ("removed", "removed"),
+    ("unchanged", "unchanged"),
+])
+def test_vote_message_describes_the_action(client, db, monkeypatch, path, vote_function, vote, action, message):
+    user = User(id=str(uuid.uuid4()), fullName="Voter")
+    db.add(user)
+    db.commit()
+    client.cookies.set("access_token", create_jwt_token(user.id, ""))
+    monkeypatch.setattr(main, vote_function, lambda db, review_id, user_id: {"action": action, "upvotes": 0, "downvotes": 0})
+
+    response = client.post(path)
+
+    assert response.status_code == 200
+    assert response.json()["message"] == f"{vote} {message}"
+    assert response.json()["action"] == action
@@ -0,0 +1,273 @@
+"""
+Opt-in write coalescing for review votes (VOTE_BATCHING_ENABLED=true).
+
+Vote clicks are recorded in an in-process buffer and flushed every
+VOTE_BATCH_FLUSH_MS milliseconds, or as soon as VOTE_BATCH_MAX_EVENTS clicks
+are waiting, as one multi-row statement that applies the net change per review.
+Repeated clicks by the same user on the same review collapse into their final state.
+
+The buffer is consulted before the database when working out a user's own vote,
+so a user sees the result of their previous clicks even before a flush. The buffer
+is per process, though: a request handled by another worker sees only what has
+been flushed.
+"""
+import asyncio
+import os
+import threading
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Review, ReviewVote
+
+VOTE_BATCHING_ENABLED = os.getenv("VOTE_BATCHING_ENABLED", "false").lower() == "true"
+VOTE_BATCH_FLUSH_MS = int(os.getenv("VOTE_BATCH_FLUSH_MS", 200))
+VOTE_BATCH_MAX_EVENTS = int(os.getenv("VOTE_BATCH_MAX_EVENTS", 500))
+
+# Applies a batch of final vote states ({incoming}) in a single statement.
+# Counter deltas are computed against the vote rows actually in the table, so the
+# result stays correct even if another process changed a vote since it was buffered.
+# Votes for reviews or users deleted since the click was buffered are dropped, so
+# they can't fail a foreign key and block the rest of the batch on every retry.
+FLUSH_VOTES_SQL = """
+    WITH incoming (review_id, user_id, vote) AS (
+        SELECT i.review_id, i.user_id, i.vote
+        FROM (VALUES {incoming}) AS i (review_id, user_id, vote)
+        JOIN reviews r ON r.id = i.review_id
+        JOIN users u ON u.id = i.user_id
+    ), previous AS (
+        SELECT i.review_id, i.user_id, i.vote AS new_vote, COALESCE(v.vote, 0) AS old_vote
+        FROM incoming i
+        LEFT JOIN review_votes v ON v.review_id = i.review_id AND v.user_id = i.user_id
+    ), removed AS (
+        DELETE FROM review_votes v
+        USING previous p
+        WHERE v.review_id = p.review_id AND v.user_id = p.user_id AND p.new_vote = 0
+        RETURNING v.id
+    ), upserted AS (
+        INSERT INTO review_votes (review_id, user_id, vote)
+        SELECT review_id, user_id, new_vote FROM previous WHERE new_vote <> 0
+        ON CONFLICT (review_id, user_id) DO UPDATE SET vote = EXCLUDED.vote
+        RETURNING id
+    ), delta AS (
+        SELECT
+            review_id,
+            SUM((new_vote = 1)::int - (old_vote = 1)::int) AS up,
+            SUM((new_vote = -1)::int - (old_vote = -1)::int) AS down
+        FROM previous
+        GROUP BY review_id
+    )
+    UPDATE reviews
+    SET upvotes = GREATEST(COALESCE(reviews.upvotes, 0) + delta.up, 0),
+        downvotes = GREATEST(COALESCE(reviews.downvotes, 0) + delta.down, 0)
+    FROM delta
+    WHERE reviews.id = delta.review_id AND (delta.up <> 0 OR delta.down <> 0)
+"""
+
+
+class VoteBuffer:
+    """
+    Buffers vote clicks per (review_id, user_id) as (vote before the click, desired vote),
+    where 0 means "no vote", and keeps a running counter delta per review so the
+    counts returned to clients include buffered clicks.
+    """
+
+    def __init__(self, flush_ms: int = VOTE_BATCH_FLUSH_MS, max_events: int = VOTE_BATCH_MAX_EVENTS):
+        self.flush_ms = flush_ms
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._deltas = {}
+        # Batch currently being written, still visible to readers until it commits
+        self._flushing = {}
+        self._flushing_deltas = {}
+        self._generation = 0
+        self._changed_reviews = set()
+        self._events = 0
+        self._loop = None
+        self._wake = None
+        self._task = None
+
+    def _current_vote(self, key, persisted_vote):
+        for batch in (self._pending, self._flushing):
+            if key in batch:
+                return batch[key][1]
+        return persisted_vote
+
+    def _review_delta(self, review_id):
+        up, down = 0, 0
+        for deltas in (self._deltas, self._flushing_deltas):
+            review_up, review_down = deltas.get(review_id, (0, 0))
+            up += review_up
+            down += review_down
+        return up, down
+
+    def submit(self, db: Session, review_id: int, user_id: str, vote: int):
+        """
+        Buffers an upvote (+1) or downvote (-1) click, with the same toggle semantics
+        as crud.cast_review_vote, and returns the action taken with the review's counts.
+        """
+        while True:
+            generation = self._generation
+            row = db.query(Review.upvotes, Review.downvotes, ReviewVote.vote).outerjoin(
+                ReviewVote, and_(ReviewVote.review_id == Review.id, ReviewVote.user_id == user_id)
+            ).filter(Review.id == review_id).first()
+            if not row:
+                raise HTTPException(status_code=404, detail="Review not found")
+
+            with self._lock:
+                # A flush committed while we were reading, so the row may be stale
+                if generation != self._generation:
+                    continue
+
+                key = (review_id, user_id)
+                current_vote = self._current_vote(key, row.vote or 0)
+                new_vote = 0 if current_vote == vote else vote
+
+                base_vote = self._pending[key][0] if key in self._pending else current_vote
+                self._pending[key] = (base_vote, new_vote)
+
+                up, down = self._deltas.get(review_id, (0, 0))
+                up += (new_vote == 1) - (current_vote == 1)
+                down += (new_vote == -1) - (current_vote == -1)
+                self._deltas[review_id] = (up, down)
+
+                up, down = self._review_delta(review_id)
+                self._events += 1
+                should_wake = self._events >= self.max_events
+            break
+
+        if should_wake and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+        if new_vote == 0:
+            action = "removed"
+        elif current_vote == 0:
+            action = "added"
+        else:
+            action = "changed"
+        return {
+            "action": action,
+            "upvotes": max((row.upvotes or 0) + up, 0),
+            "downvotes": max((row.downvotes or 0) + down, 0),
+        }
+
+    def flush(self, user_id: str = None):
+        """
+        Writes buffered votes (only `user_id`'s if given) to the database in one statement.
+        Returns the ids of the reviews whose votes changed; they are also remembered
+        until drain_changed_reviews() so the flusher can invalidate their caches.
+        """
+        with self._flush_lock:
+            with self._lock:
+                keys = [key for key in self._pending if user_id is None or key[1] == user_id]
+                if not keys:
+                    return []
+                for key in keys:
+                    self._flushing[key] = self._pending.pop(key)
+                if user_id is None:
+                    self._flushing_deltas, self._deltas = self._deltas, {}
+                else:
+                    # Recompute the per-review deltas of the entries moving out of _pending
+                    for (review_id, _), (base_vote, new_vote) in self._flushing.items():
+                        moved_up = (new_vote == 1) - (base_vote == 1)
+                        moved_down = (new_vote == -1) - (base_vote == -1)
+                        up, down = self._deltas.get(review_id, (0, 0))
+                        self._deltas[review_id] = (up - moved_up, down - moved_down)
+                        up, down = self._flushing_deltas.get(review_id, (0, 0))
+                        self._flushing_deltas[review_id] = (up + moved_up, down + moved_down)
+                self._events = len(self._pending)
+                batch = dict(self._flushing)
+
+            # Clicks that cancelled each other out need no write
+            changed = {key: votes for key, votes in batch.items() if votes[0] != votes[1]}
+            try:
+                params = {}
+                values = []
+                for i, ((review_id, voter_id), (_, new_vote)) in enumerate(changed.items()):
+                    values.append(f"(CAST(:r{i} AS INTEGER), CAST(:u{i} AS VARCHAR), CAST(:v{i} AS INTEGER))")
+                    params.update({f"r{i}": review_id, f"u{i}": voter_id, f"v{i}": new_vote})
+
+                with SessionLocal() as flush_db:
+                    if values:
+                        flush_db.execute(text(FLUSH_VOTES_SQL.format(incoming=", ".join(values))), params)
+                    # Commit and retire the batch atomically with respect to submit(),
+                    # so readers never count it twice or miss it
+                    with self._lock:
+                        flush_db.commit()
+                        self._flushing, self._flushing_deltas = {}, {}
+                        self._generation += 1
+                        review_ids = {review_id for review_id, _ in changed}
+                        self._changed_reviews.update(review_ids)
+            except Exception as e:
+                # Put the batch back so it is retried on the next flush
+                print(f"Vote batch flush failed: {str(e)}")
+                with self._lock:
+                    for key, (base_vote, new_vote) in batch.items():
+                        if key in self._pending:
+                            self._pending[key] = (base_vote, self._pending[key][1])
+                        else:
+                            self._pending[key] = (base_vote, new_vote)
+                    for review_id, (up, down) in self._flushing_deltas.items():
+                        pending_up, pending_down = self._deltas.get(review_id, (0, 0))
+                        self._deltas[review_id] = (pending_up + up, pending_down + down)
+                    self._flushing, self._flushing_deltas = {}, {}
+                    self._events = len(self._pending)
+                return []
+
+            return sorted(review_ids)
+
+    def drain_changed_reviews(self):
+        """Returns (and forgets) the ids of reviews written by flushes since the last call."""
+        with self._lock:
+            review_ids, self._changed_reviews = sorted(self._changed_reviews), set()
+        return review_ids
+
+    async def run(self, on_flush=None):
+        """
+        Flushes the buffer every flush_ms milliseconds, or early when max_events clicks
+        are waiting. `on_flush` is awaited with the ids of the reviews that changed,
+        including those written by per-user flushes in between.
+        An error is logged and the loop carries on, so one failed round doesn't stop
+        votes from reaching the database; reviews whose `on_flush` failed are passed
+        to it again on the next round.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            review_ids = []
+            try:
+                await run_in_threadpool(self.flush)
+                review_ids = self.drain_changed_reviews()
+                if review_ids and on_flush:
+                    await on_flush(review_ids)
+            except Exception as e:
+                print(f"Vote flusher round failed: {str(e)}")
+                with self._lock:
+                    self._changed_reviews.update(review_ids)
+
+    def start(self, on_flush=None):
+        """Starts the periodic flusher on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self.run(on_flush))
+
+    async def stop(self, on_flush=None):
+        """Stops the periodic flusher and writes out anything still buffered."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await run_in_threadpool(self.flush)
+        review_ids = self.drain_changed_reviews()
+        if review_ids and on_flush:
+            await on_flush(review_ids)
+
+
+vote_buffer = VoteBuffer()
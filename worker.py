@@ -0,0 +1,18 @@
+"""
+Job worker entrypoint (the Procfile "worker" process).
+
+Runs background jobs queued by the web process when JOB_QUEUE_BACKEND=redis:
+
+    python worker.py
+"""
+import signal
+
+import crud  # noqa: F401  (registers the job handlers)
+from jobs import JobWorker
+
+if __name__ == "__main__":
+    worker = JobWorker()
+    # Finish the current job, then exit, when the platform stops the process
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()